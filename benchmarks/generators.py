@@ -0,0 +1,98 @@
+import numpy as np
+
+
+# Глубокое дерево: цепочка 1 -> 2 -> ... -> n
+def deep_tree(n):
+    return [(str(i), str(i + 1)) for i in range(1, n)]
+
+# Широкое дерево: корень и n - 1 листьев
+def wide_tree(n):
+    return [("1", str(i)) for i in range(2, n + 1)]
+
+# Случайное дерево: родитель каждой вершины выбирается среди предыдущих
+def random_tree(n, seed=0):
+    rng = np.random.default_rng(seed)
+    parents = (rng.random(n - 1) * np.arange(1, n)).astype(np.int64) + 1
+    return [(str(parent), str(child)) for parent, child in zip(parents.tolist(), range(2, n + 1))]
+
+# Случайный DAG: случайное дерево и extra дополнительных рёбер "вперёд" по номерам
+def random_dag(n, extra=None, seed=0):
+    rng = np.random.default_rng(seed)
+    edges = set(random_tree(n, seed))
+    extra = n // 2 if extra is None else extra
+    while extra > 0:
+        a, b = np.sort(rng.integers(1, n + 1, 2))
+        if a != b and (str(a), str(b)) not in edges:
+            edges.add((str(a), str(b)))
+            extra -= 1
+    return sorted(edges, key=lambda edge: (int(edge[1]), int(edge[0])))
+
+# Вложенный JSON задачи для дерева. Строится без рекурсии, чтобы глубокие
+# деревья не упирались в предел рекурсии json.dumps
+def tree_to_json(edges):
+    children = {}
+    parents = set()
+    for parent, child in edges:
+        children.setdefault(parent, []).append(child)
+        parents.add(child)
+    roots = [node for node in children if node not in parents]
+
+    parts = ["{"]
+    stack = [(roots, 0)]
+    while stack:
+        nodes, index = stack.pop()
+        if index == len(nodes):
+            parts.append("}")
+            continue
+        stack.append((nodes, index + 1))
+        if index:
+            parts.append(",")
+        parts.append(f'"{nodes[index]}":{{')
+        stack.append((children.get(nodes[index], []), 0))
+    return "".join(parts)
+
+# Ранжировка n объектов, где доля tie_fraction объектов попадает в кластеры
+# строгого равенства размером до max_tie
+def ranking_with_ties(n, tie_fraction=0.3, max_tie=4, seed=0, order=None):
+    rng = np.random.default_rng(seed)
+    objects = rng.permutation(n) + 1 if order is None else np.asarray(order)
+    ranking = []
+    i = 0
+    while i < n:
+        size = int(rng.integers(2, max_tie + 1)) if rng.random() < tie_fraction else 1
+        cluster = objects[i:i + size].tolist()
+        ranking.append(cluster if len(cluster) > 1 else cluster[0])
+        i += size
+    return ranking
+
+# Пара близких ранжировок: вторая получается из первой перестановкой noise
+# доли соседних объектов, поэтому ядро противоречий остаётся обозримым
+def ranking_pair(n, tie_fraction=0.3, noise=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(n) + 1
+    ranking_a = ranking_with_ties(n, tie_fraction, seed=seed, order=order)
+    order = order.copy()
+    for i in rng.choice(n - 1, int(n * noise), replace=False):
+        order[i], order[i + 1] = order[i + 1], order[i]
+    ranking_b = ranking_with_ties(n, tie_fraction, seed=seed + 1, order=order)
+    return ranking_a, ranking_b
+
+# Категориальные данные: n наблюдений m переменных, значения 0..categories-1,
+# вторая половина столбцов зависит от первой
+def categorical_data(n, m=4, categories=8, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, categories, (n, m))
+    half = m // 2
+    data[:, half:2 * half] = (data[:, :half] + rng.integers(0, 2, (n, half))) % categories
+    return data
+
+# Неравномерная кость: faces граней со случайными вероятностями
+def loaded_die(faces=6, seed=0):
+    rng = np.random.default_rng(seed)
+    weights = rng.random(faces) + 0.1
+    weights /= weights.sum()
+    return {face: float(weight) for face, weight in zip(range(1, faces + 1), weights)}
+
+# Равномерная сетка температур
+def temperature_sweep(n, low=-10.0, high=50.0):
+    return np.linspace(low, high, n)
@@ -0,0 +1,213 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+# Только при запуске файлом (python benchmarks/run.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import generators
+from common.graph import Graph, build_relationship_table, json_to_edges
+from common.graphfile import open_graph, write_graph
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_task(name):
+    return importlib.import_module(f"{name}.task")
+
+
+# Подготовка каждого замера вне измеряемого времени: setup(size) возвращает
+# функцию без аргументов и число обрабатываемых элементов
+def _json_to_edges(generator):
+    def setup(size):
+        input_str = generators.tree_to_json(generator(size))
+        return lambda: json_to_edges(input_str), size
+    return setup
+
+def _relationship_table(generator):
+    def setup(size):
+        edges = generator(size)
+        return lambda: build_relationship_table(edges), size
+    return setup
+
+# Бинарный граф во временном каталоге прогона: открытие через mmap и таблица
+# отношений по сохранённым столбцам
+def _graph_file(generator, with_table, workdir):
+    def setup(size):
+        path = os.path.join(workdir, f"graph-{'table' if with_table else 'open'}-{size}.sag")
+        write_graph(path, Graph.from_edges(generator(size)), relationships=True)
+        if with_table:
+            return lambda: build_relationship_table(open_graph(path)), size
+        return lambda: open_graph(path), size
+    return setup
+
+def _calculate_entropy(task3, vectorized):
+    def setup(size):
+        table = build_relationship_table(generators.random_tree(size))
+        if vectorized:
+            array = task3.relationship_table_to_array(table)
+            return lambda: task3.calculate_entropy_array(array), size
+        return lambda: task3.calculate_entropy(table), size
+    return setup
+
+def _contradiction_core(task5):
+    def setup(size):
+        ranking_a, ranking_b = generators.ranking_pair(size)
+        return lambda: task5.find_contradiction_core(ranking_a, ranking_b), size
+    return setup
+
+def _dice_entropies(task4):
+    def setup(size):
+        die = generators.loaded_die(6)
+        return lambda: task4.dice_entropies(size, distribution=die), size
+    return setup
+
+def _pairwise_information(task4):
+    def setup(size):
+        data = generators.categorical_data(size)
+        return lambda: task4.pairwise_information(data), size
+    return setup
+
+def _fuzzy_controller(task6, defuzzification):
+    def setup(size):
+        controller = task6.FuzzyController(task6.x1, task6.x2, task6.x3, defuzzification=defuzzification)
+        temperatures = generators.temperature_sweep(size)
+        return lambda: controller.evaluate_batch(temperatures), size
+    return setup
+
+def _control_table(task6):
+    def setup(size):
+        table = task6.ControlTable.from_controller(task6.FuzzyController(task6.x1, task6.x2, task6.x3))
+        temperatures = generators.temperature_sweep(size)
+        return lambda: table.lookup_batch(temperatures), size
+    return setup
+
+
+# Имя замера, подготовка и размеры для профилей quick / full.
+# workdir — каталог для временных файлов замеров
+def benchmarks(workdir):
+    task3 = load_task("task3")
+    task4 = load_task("task4")
+    task5 = load_task("task5")
+    task6 = load_task("task6")
+    return [
+        ("json_to_edges/deep", _json_to_edges(generators.deep_tree), [1_000, 10_000], [100_000]),
+        ("json_to_edges/wide", _json_to_edges(generators.wide_tree), [1_000, 10_000], [100_000, 1_000_000]),
+        ("json_to_edges/random", _json_to_edges(generators.random_tree), [1_000, 10_000], [100_000, 1_000_000]),
+        ("relationship_table/deep", _relationship_table(generators.deep_tree), [1_000, 10_000], [100_000]),
+        ("relationship_table/wide", _relationship_table(generators.wide_tree), [1_000, 10_000], [100_000, 1_000_000]),
+        ("relationship_table/random", _relationship_table(generators.random_tree), [1_000, 10_000], [100_000, 1_000_000]),
+        ("relationship_table/dag", _relationship_table(generators.random_dag), [1_000, 5_000], [20_000]),
+        ("graph_file/open", _graph_file(generators.random_tree, False, workdir), [10_000, 100_000], [1_000_000]),
+        ("graph_file/relationship_table", _graph_file(generators.random_tree, True, workdir), [1_000, 10_000], [100_000, 1_000_000]),
+        ("calculate_entropy", _calculate_entropy(task3, False), [1_000, 10_000], [100_000]),
+        ("calculate_entropy_array", _calculate_entropy(task3, True), [1_000, 10_000], [100_000, 1_000_000]),
+        ("find_contradiction_core", _contradiction_core(task5), [1_000, 10_000], [100_000]),
+        ("dice_entropies", _dice_entropies(task4), [2, 4], [8, 12]),
+        ("pairwise_information", _pairwise_information(task4), [10_000, 100_000], [1_000_000]),
+        ("fuzzy_controller/sampled", _fuzzy_controller(task6, "sampled"), [1_000, 10_000], [100_000, 1_000_000]),
+        ("fuzzy_controller/exact", _fuzzy_controller(task6, "exact"), [1_000, 10_000], [100_000, 1_000_000]),
+        ("control_table", _control_table(task6), [10_000, 100_000], [1_000_000, 10_000_000]),
+    ]
+
+
+# Время: repeat прогонов, минимум и медиана. Пик памяти — отдельным прогоном под
+# tracemalloc, чтобы трассировка не искажала время
+def measure(run, repeat=3):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds_min": min(times), "seconds_median": statistics.median(times), "peak_bytes": peak}
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(profile="quick", only=None, repeat=3, log=sys.stderr):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="benchmarks-") as workdir:
+        for name, setup, quick, full in benchmarks(workdir):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            for size in quick + full if profile == "full" else quick:
+                run, items = setup(size)
+                result = {"benchmark": name, "size": size, **measure(run, repeat)}
+                result["items_per_second"] = items / result["seconds_min"] if result["seconds_min"] else None
+                results.append(result)
+                if log is not None:
+                    print(
+                        f"{name:28} {size:>10} {result['seconds_min'] * 1000:10.2f} ms {result['peak_bytes'] / 2**20:9.1f} MiB",
+                        file=log,
+                    )
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "profile": profile,
+        "repeat": repeat,
+        "results": results,
+    }
+
+# Сравнение с сохранённым отчётом: отношение времени текущего замера к базовому
+def compare(report, baseline):
+    base = {(r["benchmark"], r["size"]): r for r in baseline["results"]}
+    rows = []
+    for result in report["results"]:
+        previous = base.get((result["benchmark"], result["size"]))
+        if previous:
+            rows.append({
+                "benchmark": result["benchmark"],
+                "size": result["size"],
+                "time_ratio": result["seconds_min"] / previous["seconds_min"],
+                "memory_ratio": result["peak_bytes"] / previous["peak_bytes"] if previous["peak_bytes"] else None,
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Замеры времени и памяти по всем задачам")
+    parser.add_argument("-p", "--profile", choices=["quick", "full"], default="quick", help="набор размеров")
+    parser.add_argument("-k", "--only", action="append", help="только замеры, в имени которых есть подстрока")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="повторов на замер")
+    parser.add_argument("-o", "--output", default=None, help="файл JSON с результатами (иначе stdout)")
+    parser.add_argument("-c", "--compare", default=None, help="отчёт JSON предыдущего прогона для сравнения")
+    args = parser.parse_args(argv)
+    report = run_benchmarks(args.profile, args.only, args.repeat)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["comparison"] = {"baseline": args.compare, "results": compare(report, json.load(f))}
+        for row in report["comparison"]["results"]:
+            print(f"{row['benchmark']:28} {row['size']:>10} x{row['time_ratio']:.2f}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import argparse
+import json
+import sys
+
+from common.profiling import add_profile_arguments, finish_profiling, start_profiling
+
+# Единая точка входа для всех задач: python cli.py <команда> ...
+# Модули задач, numpy и tabulate загружаются только внутри выбранной команды,
+# поэтому разбор аргументов и --help не платят за тяжёлые импорты
+
+SINK_NAMES = ["console", "csv", "ndjson", "silent", "summary"]
+
+
+# Текст из файла или из stdin ("-")
+def read_input(path):
+    if path == "-":
+        return sys.stdin.read()
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+# Иерархия для task1-task3: бинарный граф открывается через mmap, иначе текст JSON
+def read_hierarchy(path):
+    if path != "-":
+        from common.graphfile import is_graph_file, open_graph
+
+        if is_graph_file(path):
+            return open_graph(path)
+    return read_input(path)
+
+# JSON из строки или из файла (@путь)
+def read_json(value):
+    return json.loads(read_input(value[1:]) if value.startswith("@") else value)
+
+
+def run_adjacency(args):
+    from common.output import ConsoleSink, make_sink
+    from task1.task import main
+
+    sink = ConsoleSink(separator="") if args.output == "console" else make_sink(args.output)
+    main(read_hierarchy(args.input), sink)
+
+def open_cache(args):
+    from common.cache import AnalysisCache
+
+    return AnalysisCache(path=args.cache) if args.cache else None
+
+def run_relations(args):
+    from common.output import make_sink
+    from task2.task import main
+
+    main(read_hierarchy(args.input), make_sink(args.output), open_cache(args))
+
+def run_entropy(args):
+    from common.output import make_sink
+    from task3.task import batch_main, main
+
+    if args.batch:
+        batch_main(args.input, args.workers, args.chunk_size, cache_path=args.cache)
+    else:
+        main(read_hierarchy(args.input), make_sink(args.output), open_cache(args))
+
+def run_dice(args):
+    from task4.task import dice_entropies
+
+    distribution = None
+    if args.distribution:
+        distribution = {int(face): float(p) for face, p in read_json(args.distribution).items()}
+    try:
+        values = dice_entropies(args.dice, args.faces, distribution)
+    except ValueError as error:
+        sys.exit(f"dice: {error}")
+    print(json.dumps(dict(zip(["H(AB)", "H(A)", "H(B)", "H_a(B)", "I(A,B)"], values)), ensure_ascii=False))
+
+def run_contradictions(args):
+    from task5.task import consensus_ranking, find_contradiction_core
+
+    rankings = [read_json(ranking) for ranking in args.rankings]
+    if args.consensus:
+        print(json.dumps(consensus_ranking(rankings), ensure_ascii=False))
+    else:
+        print(find_contradiction_core(rankings[0], rankings[1]))
+
+def run_fuzzy(args):
+    from task6.task import FuzzyController, x1, x2, x3
+
+    terms = [read_input(path) if path else default for path, default in ((args.terms, x1), (args.heat, x2), (args.rules, x3))]
+    controller = FuzzyController(*terms, defuzzification="exact" if args.exact else "sampled")
+    for temperature, control in zip(args.temperatures, controller.evaluate_batch(args.temperatures).tolist()):
+        print(f"{temperature}\t{control}")
+
+def run_convert(args):
+    from common.graphfile import convert_json
+
+    graph = convert_json(args.input, args.output, relationships=not args.no_relationships)
+    print(f"{args.output}: {graph.node_count} вершин, {graph.edge_count} рёбер", file=sys.stderr)
+
+# serve и bench передают свои параметры как есть: argparse не умеет отдавать
+# подкоманде остаток строки, начинающийся с ключей
+def run_serve(argv):
+    from task6.server import main
+
+    main(argv)
+
+def run_bench(argv):
+    from benchmarks.run import main
+
+    main(argv)
+
+PASSTHROUGH = {"serve": run_serve, "bench": run_bench}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Системный анализ: задачи 1-6")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # --profile и --profile-memory есть у каждой команды
+    profile = argparse.ArgumentParser(add_help=False)
+    add_profile_arguments(profile)
+
+    command = commands.add_parser("adjacency", parents=[profile], help="матрица и список смежности дерева (task1)")
+    command.add_argument("input", nargs="?", default="-", help="JSON иерархии или бинарный граф, '-' — stdin")
+    command.add_argument("-o", "--output", choices=SINK_NAMES, default="console", help="режим вывода")
+    command.set_defaults(run=run_adjacency)
+
+    command = commands.add_parser("relations", parents=[profile], help="таблица отношений вершин (task2)")
+    command.add_argument("input", nargs="?", default="-", help="JSON иерархии или бинарный граф, '-' — stdin")
+    command.add_argument("-o", "--output", choices=SINK_NAMES, default="console", help="режим вывода")
+    command.add_argument("--cache", default=None, metavar="FILE", help="кэш результатов в файле SQLite")
+    command.set_defaults(run=run_relations)
+
+    command = commands.add_parser("entropy", parents=[profile], help="структурная энтропия иерархии (task3)")
+    command.add_argument("input", nargs="?", default="-", help="JSON иерархии или бинарный граф, '-' — stdin; с --batch — каталог или NDJSON")
+    command.add_argument("-o", "--output", choices=SINK_NAMES, default="console", help="режим вывода")
+    command.add_argument("-b", "--batch", action="store_true", help="пакетная оценка многих иерархий")
+    command.add_argument("-w", "--workers", type=int, default=None, help="число процессов")
+    command.add_argument("-c", "--chunk-size", type=int, default=16, help="иерархий в одной задаче пула")
+    command.add_argument("--cache", default=None, metavar="FILE", help="кэш результатов в файле SQLite")
+    command.set_defaults(run=run_entropy)
+
+    command = commands.add_parser("dice", parents=[profile], help="энтропии суммы и произведения очков (task4)")
+    command.add_argument("-n", "--dice", type=int, default=2, help="число костей")
+    command.add_argument("-f", "--faces", type=int, default=6, help="число граней")
+    command.add_argument("-d", "--distribution", default=None, help="JSON {грань: вероятность} или @файл")
+    command.set_defaults(run=run_dice)
+
+    command = commands.add_parser("contradictions", parents=[profile], help="ядро противоречий ранжировок (task5)")
+    command.add_argument("rankings", nargs="+", help="ранжировки в JSON или @файл")
+    command.add_argument("--consensus", action="store_true", help="согласованная ранжировка всех экспертов")
+    command.set_defaults(run=run_contradictions)
+
+    command = commands.add_parser("fuzzy", parents=[profile], help="нечёткий регулятор отопления (task6)")
+    command.add_argument("temperatures", nargs="+", type=float, help="температуры")
+    command.add_argument("--terms", default=None, help="JSON термов температуры (по умолчанию из задачи)")
+    command.add_argument("--heat", default=None, help="JSON термов нагрева")
+    command.add_argument("--rules", default=None, help="JSON правил")
+    command.add_argument("--exact", action="store_true", help="точный центроид вместо сетки")
+    command.set_defaults(run=run_fuzzy)
+
+    command = commands.add_parser("convert", parents=[profile], help="вложенный JSON в бинарный граф (.sag)")
+    command.add_argument("input", help="JSON иерархии")
+    command.add_argument("output", help="файл бинарного графа")
+    command.add_argument("--no-relationships", action="store_true", help="не сохранять столбцы таблицы отношений")
+    command.set_defaults(run=run_convert)
+
+    commands.add_parser("serve", help="сервис регулятора по строкам JSON, параметры task6/server.py")
+    commands.add_parser("bench", help="замеры производительности, параметры benchmarks/run.py")
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] in PASSTHROUGH:
+        PASSTHROUGH[argv[0]](argv[1:])
+        return
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "contradictions" and not args.consensus and len(args.rankings) != 2:
+        parser.error("для ядра противоречий нужны ровно две ранжировки")
+    start_profiling(args)
+    args.run(args)
+    finish_profiling(args)
+
+
+if __name__ == "__main__":
+    main()
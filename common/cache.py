@@ -0,0 +1,170 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+
+from common.lazy import lazy_import
+from common.profiling import count, stage
+
+np = lazy_import("numpy")
+
+# Кэш результатов анализа иерархий по содержимому. Ключ — хэш канонического вида
+# разобранного графа (отсортированные метки и рёбра), поэтому одинаковые иерархии
+# с другим форматированием или порядком ключей JSON дают одну запись. Каждое поле
+# ("table", "entropy") хранится отдельной записью (ключ, поле) в сжатом JSON, так что
+# попадание в энтропию не распаковывает таблицу: в памяти процесса в LRU с
+# ограничением по байтам и, по желанию, в файле SQLite между запусками
+
+# Меняется вместе с форматом записей или алгоритмами, чьи результаты кэшируются
+CACHE_VERSION = 2
+
+
+# Канонический ключ графа: sha256 отсортированных меток и отсортированных рёбер
+# (с учётом повторов) в номерах этих меток. Порядок меток тот же, что у строк
+# таблицы отношений, так что сортировка переиспользуется построением таблицы
+def graph_key(graph):
+    with stage("cache.key", items=graph.edge_count):
+        sorted_ids = graph.sorted_ids()
+        rank = np.empty(graph.node_count, dtype=np.int64)
+        rank[sorted_ids] = np.arange(graph.node_count)
+        edges = np.sort(rank[graph.parents] * graph.node_count + rank[graph.children])
+
+        digest = hashlib.sha256(f"graph-analysis/{CACHE_VERSION}\n".encode())
+        digest.update(json.dumps([graph.labels[node] for node in sorted_ids.tolist()], ensure_ascii=False).encode())
+        digest.update(edges.astype("<i8").tobytes())
+        return digest.hexdigest()
+
+
+def _encode(entry):
+    return zlib.compress(json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode())
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob))
+
+
+# LRU по суммарному размеру сжатых записей; ключ записи — пара (ключ графа, поле)
+class LRUStore:
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        blob = self._entries.get(key)
+        if blob is not None:
+            self._entries.move_to_end(key)
+        return blob
+
+    def put(self, key, blob):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        if len(blob) > self.max_bytes:
+            return
+        self._entries[key] = blob
+        self.size += len(blob)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            count("cache.evictions")
+
+
+# Записи в файле SQLite (режим WAL: несколько процессов читают и пишут одновременно)
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_fields "
+            "(key TEXT NOT NULL, name TEXT NOT NULL, value BLOB NOT NULL, PRIMARY KEY (key, name))"
+        )
+        self._connection.commit()
+
+    def get(self, entry):
+        key, name = entry
+        row = self._connection.execute(
+            "SELECT value FROM analysis_fields WHERE key = ? AND name = ?", (key, name)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, entry, blob):
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO analysis_fields (key, name, value) VALUES (?, ?, ?)", (*entry, blob)
+            )
+
+    def close(self):
+        self._connection.close()
+
+
+class AnalysisCache:
+    def __init__(self, max_bytes=64 << 20, path=None):
+        self.memory = LRUStore(max_bytes)
+        self.disk = SqliteStore(path) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    # Сжатое значение поля name графа key или None
+    def _load(self, key, name):
+        entry = (key, name)
+        with self._lock:
+            blob = self.memory.get(entry)
+            if blob is None and self.disk is not None:
+                blob = self.disk.get(entry)
+                if blob is not None:
+                    self.disk_hits += 1
+                    count("cache.disk_hits")
+                    self.memory.put(entry, blob)
+        return blob
+
+    def get(self, key, name, default=None):
+        blob = self._load(key, name)
+        return default if blob is None else _decode(blob)
+
+    def put(self, key, name, value):
+        blob = _encode(value)
+        with self._lock:
+            self.memory.put((key, name), blob)
+            if self.disk is not None:
+                self.disk.put((key, name), blob)
+
+    # Поле из кэша; при промахе считается compute() и сохраняется
+    def fetch(self, key, name, compute):
+        blob = self._load(key, name)
+        if blob is not None:
+            self.hits += 1
+            count("cache.hits")
+            return _decode(blob)
+        self.misses += 1
+        count("cache.misses")
+        value = compute()
+        self.put(key, name, value)
+        return value
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self.memory),
+            "bytes": self.memory.size,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+
+# Результат compute() через кэш или напрямую, если кэша нет
+def cached(cache, key, name, compute):
+    if cache is None:
+        return compute()
+    return cache.fetch(key, name, compute)
@@ -0,0 +1,781 @@
+import functools
+import io
+import json
+import sys
+from array import array
+
+from common.lazy import lazy_import
+from common.profiling import count, profiled, stage
+
+np = lazy_import("numpy")
+
+# Общее ядро графа для task1-task3: метки вершин интернируются в номера int32 один раз,
+# рёбра хранятся массивами родителей и детей, CSR-представления строятся по требованию
+# и переиспользуются всеми этапами (матрица, список смежности, таблица отношений)
+
+# Графы не больше SMALL_GRAPH_NODES вершин, пока numpy не загружен, обрабатываются
+# списками и целыми Python: на малых входах импорт numpy дольше самого расчёта.
+# Результаты обоих путей совпадают
+SMALL_GRAPH_NODES = 1024
+
+def is_small(graph):
+    return graph.node_count <= SMALL_GRAPH_NODES and "numpy" not in sys.modules
+
+
+# Граф с интернированными вершинами. labels — любая последовательность меток
+# (список или таблица меток из бинарного файла), relationship_columns — уже
+# посчитанные столбцы r1..r5 по номерам вершин (5 x n), если они есть.
+# Номера концов рёбер — array("i") после разбора JSON или массивы numpy из бинарного
+# файла; в массивы numpy int32 (parents, children) они переводятся при первом обращении
+class Graph:
+    def __init__(self, labels, parents, children, index=None, sorted_ids=None, relationship_columns=None):
+        self.labels = labels
+        self._edge_ids = (parents, children)
+        self._edge_arrays = None
+        self.relationship_columns = relationship_columns
+        self._index = index
+        self._children_csr = None
+        self._parents_csr = None
+        self._children_csr_lists = None
+        self._parents_csr_lists = None
+        self._sorted_ids = sorted_ids
+        self._sorted_id_list = None
+
+    # Интернирование меток по мере чтения рёбер: на ребро хранится два числа int32
+    @classmethod
+    @profiled("graph.intern", items=lambda graph: graph.edge_count)
+    def from_edges(cls, edges):
+        labels = []
+        index = {}
+        parents = array("i")
+        children = array("i")
+        for u, v in edges:
+            u_id = index.get(u)
+            if u_id is None:
+                u_id = index[u] = len(labels)
+                labels.append(u)
+            v_id = index.get(v)
+            if v_id is None:
+                v_id = index[v] = len(labels)
+                labels.append(v)
+            parents.append(u_id)
+            children.append(v_id)
+        return cls(labels, parents, children, index)
+
+    @classmethod
+    def from_json(cls, input_str):
+        return cls.from_edges(_iter_json_edges(input_str))
+
+    @classmethod
+    def from_stream(cls, stream, chunk_size=1 << 16):
+        return cls.from_edges(iter_edges_from_stream(stream, chunk_size))
+
+    # Номер вершины по метке; словарь строится при первом обращении
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {label: idx for idx, label in enumerate(self.labels)}
+        return self._index
+
+    @property
+    def node_count(self):
+        return len(self.labels)
+
+    @property
+    def edge_count(self):
+        return len(self._edge_ids[0])
+
+    @property
+    def parents(self):
+        return self._arrays()[0]
+
+    @property
+    def children(self):
+        return self._arrays()[1]
+
+    def _arrays(self):
+        if self._edge_arrays is None:
+            self._edge_arrays = tuple(np.asarray(ids, dtype=np.int32) for ids in self._edge_ids)
+        return self._edge_arrays
+
+    # Номера родителей и детей рёбер списками Python, без numpy
+    def edge_lists(self):
+        return tuple(ids.tolist() if hasattr(ids, "tolist") else list(ids) for ids in self._edge_ids)
+
+    # Рёбра в виде пар меток, в порядке добавления
+    def edges(self):
+        labels = self.labels
+        for u, v in zip(*self.edge_lists()):
+            yield (labels[u], labels[v])
+
+    def out_degree(self):
+        return np.bincount(self.parents, minlength=self.node_count)
+
+    def in_degree(self):
+        return np.bincount(self.children, minlength=self.node_count)
+
+    # CSR по исходящим рёбрам: дети вершины v — indices[indptr[v]:indptr[v + 1]] в порядке рёбер
+    def children_csr(self):
+        if self._children_csr is None:
+            self._children_csr = _csr(self.parents, self.children, self.node_count)
+        return self._children_csr
+
+    # CSR по входящим рёбрам: родители вершины
+    def parents_csr(self):
+        if self._parents_csr is None:
+            self._parents_csr = _csr(self.children, self.parents, self.node_count)
+        return self._parents_csr
+
+    # Те же CSR списками Python для обходов: у малого графа строятся без numpy
+    # и сохраняются, у большого — копия массивов на время обхода
+    def children_csr_lists(self):
+        if not is_small(self):
+            return tuple(part.tolist() for part in self.children_csr())
+        if self._children_csr_lists is None:
+            self._children_csr_lists = _csr_lists(*self.edge_lists(), self.node_count)
+        return self._children_csr_lists
+
+    def parents_csr_lists(self):
+        if not is_small(self):
+            return tuple(part.tolist() for part in self.parents_csr())
+        if self._parents_csr_lists is None:
+            parents, children = self.edge_lists()
+            self._parents_csr_lists = _csr_lists(children, parents, self.node_count)
+        return self._parents_csr_lists
+
+    # Номера вершин в порядке сортировки меток (порядок строк во всех таблицах)
+    def sorted_ids(self):
+        if self._sorted_ids is None:
+            self._sorted_ids = np.array(self.sorted_id_list(), dtype=np.int64)
+        return self._sorted_ids
+
+    # То же списком Python; сортировка меток выполняется один раз на граф
+    def sorted_id_list(self):
+        if self._sorted_id_list is None:
+            if self._sorted_ids is not None:
+                self._sorted_id_list = self._sorted_ids.tolist()
+            else:
+                self._sorted_id_list = sorted(range(self.node_count), key=self.labels.__getitem__)
+        return self._sorted_id_list
+
+
+
+def _csr(rows, cols, n):
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols[order]
+
+# CSR списками Python: устойчивая сортировка рёбер подсчётом
+def _csr_lists(rows, cols, n):
+    indptr = [0] * (n + 1)
+    for u in rows:
+        indptr[u + 1] += 1
+    for u in range(n):
+        indptr[u + 1] += indptr[u]
+    fill = indptr[:-1]
+    indices = [0] * len(rows)
+    for u, v in zip(rows, cols):
+        indices[fill[u]] = v
+        fill[u] += 1
+    return indptr, indices
+
+# Список рёбер или уже построенный граф
+def as_graph(edges):
+    return edges if isinstance(edges, Graph) else Graph.from_edges(edges)
+
+
+# Преобразование JSON в список рёбер
+@profiled("json_to_edges", items=len)
+def json_to_edges(input_str):
+    return list(_iter_json_edges(input_str))
+
+# Повторяющийся ключ в одном объекте — ошибка в обоих способах разбора: json.loads
+# молча оставил бы последний, а потоковый разбор уже выдал бы рёбра первого
+def _unique_keys(pairs):
+    obj = dict(pairs)
+    if len(obj) != len(pairs):
+        raise ValueError(f"Повторяющийся ключ в объекте JSON: {_duplicate_key(pairs)!r}")
+    return obj
+
+def _duplicate_key(pairs):
+    seen = set()
+    for key, _ in pairs:
+        if key in seen:
+            return key
+        seen.add(key)
+
+def _iter_json_edges(input_str):
+    try:
+        with stage("json.loads", items=len(input_str)):
+            data = json.loads(input_str, object_pairs_hook=_unique_keys)
+    except RecursionError:
+        # Слишком глубокое дерево для json.loads — разбираем потоково
+        return iter_edges_from_stream(io.StringIO(input_str))
+    return iter_edges(data)
+
+# Обход дерева с явным стеком: порядок рёбер тот же, что у рекурсивного обхода,
+# но глубина дерева больше не ограничена лимитом рекурсии. Значение, не являющееся
+# объектом, — ValueError, как и в потоковом разборе
+def iter_edges(data):
+    if not isinstance(data, dict):
+        raise _not_object(data, None)
+    for root, subtree in data.items():
+        if not isinstance(subtree, dict):
+            raise _not_object(subtree, root)
+        stack = [(root, iter(subtree.items()))]
+        while stack:
+            parent, children = stack[-1]
+            for child, subtree in children:
+                yield (parent, child)
+                if not isinstance(subtree, dict):
+                    raise _not_object(subtree, child)
+                stack.append((child, iter(subtree.items())))
+                break
+            else:
+                stack.pop()
+
+def _not_object(value, key):
+    where = "документа" if key is None else f"вершины {key!r}"
+    return ValueError(f"Значение {where} должно быть объектом, а не {type(value).__name__}")
+
+# Поиск закрывающей кавычки строки с учётом экранирования
+def _find_string_end(buf, start):
+    end = buf.find('"', start)
+    while end >= 0:
+        backslashes = 0
+        while buf[end - 1 - backslashes] == "\\":
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end
+        end = buf.find('"', end + 1)
+    return -1
+
+# Потоковое чтение лексем JSON из файла кусками по chunk_size символов
+def _iter_tokens(stream, chunk_size):
+    buf = ""
+    pos = 0
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n":
+            pos += 1
+        if pos == len(buf):
+            buf = stream.read(chunk_size)
+            pos = 0
+            if not buf:
+                return
+            continue
+
+        ch = buf[pos]
+        if ch in "{}:,":
+            pos += 1
+            yield ch, None
+        elif ch == '"':
+            end = _find_string_end(buf, pos + 1)
+            while end < 0:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    raise ValueError("Незакрытая строка в JSON")
+                buf = buf[pos:] + chunk
+                pos = 0
+                end = _find_string_end(buf, 1)
+            raw = buf[pos:end + 1]
+            pos = end + 1
+            yield '"', json.loads(raw) if "\\" in raw else raw[1:-1]
+        else:
+            raise ValueError(f"Неожиданный символ {ch!r}: значения дерева должны быть объектами")
+
+# Потоковое извлечение рёбер из файла или байтового потока без загрузки всего документа
+def iter_edges_from_stream(stream, chunk_size=1 << 16):
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding="utf-8")
+
+    stack = []  # ключи открытых объектов, None — корень документа
+    seen = []  # ключи, уже встреченные в каждом открытом объекте
+    key = None
+    state = "start"
+    for token, value in _iter_tokens(stream, chunk_size):
+        if state in ("start", "value") and token == "{":
+            if stack and stack[-1] is not None:
+                yield (stack[-1], key)
+            stack.append(key)
+            seen.append(set())
+            state = "key_or_end"
+        elif state in ("key", "key_or_end") and token == '"':
+            if value in seen[-1]:
+                raise ValueError(f"Повторяющийся ключ в объекте JSON: {value!r}")
+            seen[-1].add(value)
+            key = value
+            state = "colon"
+        elif state == "colon" and token == ":":
+            state = "value"
+        elif state == "after_value" and token == ",":
+            state = "key"
+        elif state in ("key_or_end", "after_value") and token == "}":
+            stack.pop()
+            seen.pop()
+            state = "after_value" if stack else "done"
+        else:
+            raise ValueError(f"Неожиданная лексема {token!r} в JSON-дереве")
+
+    if state != "done":
+        raise ValueError("Неожиданный конец JSON")
+
+# Разреженная матрица смежности в формате CSR (строка — вершина, столбцы — её потомки)
+class SparseAdjacencyMatrix:
+    def __init__(self, node_list, indptr, indices):
+        self.node_list = node_list
+        self.node_index = {node: idx for idx, node in enumerate(node_list)}
+        self.indptr = indptr
+        self.indices = indices
+        self._transposed = None
+
+    @property
+    def data(self):
+        return np.ones(len(self.indices), dtype=np.int8)
+
+    @property
+    def shape(self):
+        return len(self.node_list), len(self.node_list)
+
+    @property
+    def nnz(self):
+        return len(self.indices)
+
+    # Представление COO: массивы номеров строк и столбцов ненулевых элементов
+    def coo(self):
+        indices = np.asarray(self.indices, dtype=np.int32)
+        rows = np.repeat(np.arange(len(self.node_list), dtype=indices.dtype), np.diff(self.indptr))
+        return rows, indices
+
+    # CSC строится один раз при первом обращении к столбцам
+    def _csc(self):
+        if self._transposed is None:
+            n = len(self.node_list)
+            rows, cols = self.coo()
+            order = np.argsort(cols, kind="stable")
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(cols, minlength=n), out=indptr[1:])
+            self._transposed = (indptr, rows[order])
+        return self._transposed
+
+    # Прямые потомки вершины (ненулевые элементы строки)
+    def row(self, node):
+        idx = self.node_index[node]
+        return [self.node_list[j] for j in self.indices[self.indptr[idx]:self.indptr[idx + 1]]]
+
+    # Прямые предки вершины (ненулевые элементы столбца)
+    def column(self, node):
+        indptr, indices = self._csc()
+        idx = self.node_index[node]
+        return [self.node_list[i] for i in indices[indptr[idx]:indptr[idx + 1]]]
+
+    # Обратное преобразование в формат edges_to_adjacency_list
+    def to_adjacency_list(self):
+        adjacency_list = {}
+        for idx, node in enumerate(self.node_list):
+            start, end = self.indptr[idx], self.indptr[idx + 1]
+            if start != end:
+                adjacency_list[node] = [self.node_list[j] for j in self.indices[start:end]]
+        return adjacency_list
+
+    def to_dense(self):
+        return list(self)
+
+    # Плотная строка матрицы собирается по требованию, за O(n) памяти
+    def __getitem__(self, idx):
+        n = len(self.node_list)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError("индекс строки матрицы вне диапазона")
+        row = [0] * n
+        for j in self.indices[self.indptr[idx]:self.indptr[idx + 1]]:
+            row[j] = 1
+        return row
+
+    def __iter__(self):
+        for idx in range(len(self.node_list)):
+            yield self[idx]
+
+    def __len__(self):
+        return len(self.node_list)
+
+# Преобразование списка рёбер в матрицу смежности
+# По умолчанию матрица разреженная, плотный список списков — по флагу dense
+@profiled("adjacency_matrix", items=len)
+def edges_to_adjacency_matrix(edges, dense=False):
+    graph = as_graph(edges)
+    if is_small(graph):
+        return _small_adjacency_matrix(graph, dense)
+    n = graph.node_count
+    sorted_ids = graph.sorted_ids()
+    node_list = [graph.labels[idx] for idx in sorted_ids.tolist()]
+
+    # Номера строк и столбцов — позиции вершин в отсортированном списке
+    rank = np.empty(n, dtype=np.int64)
+    rank[sorted_ids] = np.arange(n)
+    src = rank[graph.parents]
+    dst = rank[graph.children]
+
+    if dense:
+        matrix = [[0] * n for _ in range(n)]
+        for u, v in zip(src.tolist(), dst.tolist()):
+            matrix[u][v] = 1
+        return matrix
+
+    # Убираем повторяющиеся рёбра, внутри строки сохраняем порядок рёбер во входном списке
+    keys, first = np.unique(src * n + dst, return_index=True)
+    rows = keys // n
+    order = np.lexsort((first, rows))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return SparseAdjacencyMatrix(node_list, indptr, (keys % n)[order].astype(np.int32))
+
+# Та же матрица для малого графа: позиции вершин и CSR списками Python
+def _small_adjacency_matrix(graph, dense):
+    n = graph.node_count
+    sorted_ids = graph.sorted_id_list()
+    node_list = [graph.labels[idx] for idx in sorted_ids]
+    rank = [0] * n
+    for position, idx in enumerate(sorted_ids):
+        rank[idx] = position
+    parents, children = graph.edge_lists()
+
+    if dense:
+        matrix = [[0] * n for _ in range(n)]
+        for u, v in zip(parents, children):
+            matrix[rank[u]][rank[v]] = 1
+        return matrix
+
+    rows = [[] for _ in range(n)]
+    seen = set()
+    for u, v in zip(parents, children):
+        if (u, v) not in seen:
+            seen.add((u, v))
+            rows[rank[u]].append(rank[v])
+    indptr = [0]
+    for row in rows:
+        indptr.append(indptr[-1] + len(row))
+    return SparseAdjacencyMatrix(node_list, indptr, [column for row in rows for column in row])
+
+# Преобразование списка рёбер в список смежности
+@profiled("adjacency_list", items=len)
+def edges_to_adjacency_list(edges):
+    graph = as_graph(edges)
+    labels = graph.labels
+    indptr, indices = graph.children_csr_lists()
+
+    adjacency_list = {}
+    for node in range(graph.node_count):
+        start, end = indptr[node], indptr[node + 1]
+        if start != end:
+            adjacency_list[labels[node]] = [labels[child] for child in indices[start:end]]
+    return adjacency_list
+
+# Топологический порядок номеров вершин (алгоритм Кана), None — если в графе есть цикл
+@profiled("topological_order", items=lambda order: len(order or ()))
+def topological_order(graph):
+    indptr, indices = graph.children_csr_lists()
+    if is_small(graph):
+        in_degree = [0] * graph.node_count
+        for child in indices:
+            in_degree[child] += 1
+    else:
+        in_degree = graph.in_degree().tolist()
+
+    order = [node for node in range(graph.node_count) if in_degree[node] == 0]
+    for node in order:
+        for child in indices[indptr[node]:indptr[node + 1]]:
+            in_degree[child] -= 1
+            if in_degree[child] == 0:
+                order.append(child)
+    return order if len(order) == graph.node_count else None
+
+# Дерево: число предков — глубина вершины, число потомков — размер поддерева без неё самой
+def tree_reachable_counts(graph, order):
+    return _forest_counts(graph.node_count, graph.parents, graph.children, order)
+
+# Глубина и размер поддерева по рёбрам леса (у каждой вершины не больше одного родителя)
+def _forest_counts(n, parents, children, order):
+    parent = [-1] * n
+    for u, v in zip(parents.tolist(), children.tolist()):
+        parent[v] = u
+
+    depth = [0] * n
+    for node in order:
+        if parent[node] >= 0:
+            depth[node] = depth[parent[node]] + 1
+
+    size = [1] * n
+    for node in reversed(order):
+        if parent[node] >= 0:
+            size[parent[node]] += size[node]
+
+    return np.array(depth, dtype=np.int64), np.array(size, dtype=np.int64) - 1
+
+# Вершины, достижимые из starts (включая их), по CSR одного из направлений
+def _closure(csr, starts, n):
+    indptr, indices = csr
+    reached = np.zeros(n, dtype=bool)
+    frontier = np.unique(np.asarray(starts, dtype=np.int64))
+    reached[frontier] = True
+    while len(frontier):
+        counts = indptr[frontier + 1] - indptr[frontier]
+        positions = np.repeat(indptr[frontier] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        neighbors = indices[positions]
+        frontier = np.unique(neighbors[~reached[neighbors]])
+        reached[frontier] = True
+    return reached
+
+# Таблица числа единичных битов в байте (для numpy без bitwise_count)
+@functools.cache
+def _popcount_table():
+    return np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Число единичных битов в каждой строке упакованной битовой матрицы
+def _popcount_rows(bits):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int64)
+    return _popcount_table()[bits.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+# Число единичных битов в каждом столбце по строкам rows: строки распаковываются
+# блоками не больше block_bytes, вся матрица в байтах не разворачивается
+def _popcount_columns(bits, rows, block_bytes=4 << 20):
+    counts = np.zeros(bits.shape[1] * 64, dtype=np.int64)
+    step = max(1, block_bytes // max(1, counts.size))
+    for lo in range(0, len(rows), step):
+        block = bits[rows[lo:lo + step]].astype("<u8", copy=False).view(np.uint8)
+        counts += np.unpackbits(block, axis=1, bitorder="little").sum(axis=0, dtype=np.int64)
+    return counts
+
+# Предел памяти битового индекса в relationship_columns; больше — поиск по вершинам
+REACHABILITY_INDEX_MAX_BYTES = 256 << 20
+
+# Индекс достижимости DAG: строка i — множество предков i-й вершины индекса, упакованное
+# в uint64. nodes — вершины индекса (по умолчанию все); множество должно быть замкнуто
+# вверх, т.е. содержать всех предков своих вершин. Строки и столбцы — позиции в nodes
+class ReachabilityIndex:
+    def __init__(self, graph, order=None, nodes=None):
+        if order is None:
+            order = topological_order(graph)
+        if order is None:
+            raise ValueError("Граф содержит цикл, индекс достижимости строится только для DAG")
+
+        self.graph = graph
+        n = graph.node_count
+        self.nodes = np.arange(n, dtype=np.int64) if nodes is None else np.asarray(nodes, dtype=np.int64)
+        self.position = np.full(n, -1, dtype=np.int64)
+        self.position[self.nodes] = np.arange(len(self.nodes))
+        words = (len(self.nodes) + 63) // 64
+
+        # Уровень — длина самого длинного пути от истока до вершины
+        indptr, indices = graph.children_csr_lists()
+        inside = (self.position >= 0).tolist()
+        level = [0] * n
+        for node in order:
+            if inside[node]:
+                for child in indices[indptr[node]:indptr[node + 1]]:
+                    level[child] = max(level[child], level[node] + 1)
+
+        # Рёбра внутри индекса: родитель вершины индекса тоже в индексе
+        edges = self.position[graph.children] >= 0
+        parents = self.position[graph.parents[edges]]
+        children = self.position[graph.children[edges]]
+        child_level = np.array(level, dtype=np.int64)[graph.children[edges]]
+
+        # Предки: строки вершин одного уровня заполняются одной векторной операцией
+        self.ancestors = np.zeros((len(self.nodes), words), dtype=np.uint64)
+        self._propagate(self.ancestors, children, parents, child_level)
+        self.ancestor_counts = _popcount_rows(self.ancestors)
+        self._descendant_counts = None
+
+    # Число байт индекса по числу его вершин
+    @staticmethod
+    def estimate_bytes(node_count):
+        return node_count * ((node_count + 63) // 64) * 8
+
+    # target[dst] = OR по рёбрам (target[src] | бит src), рёбра обрабатываются по уровням dst.
+    # Рёбра уровня берутся блоками, чтобы промежуточный массив строк не рос с шириной уровня
+    @staticmethod
+    def _propagate(bits, dst, src, dst_level, block_bytes=16 << 20):
+        order = np.lexsort((dst, dst_level))
+        dst, src, dst_level = dst[order], src[order], dst_level[order]
+        step = max(1, block_bytes // max(1, bits.shape[1] * 8))
+        bounds = np.flatnonzero(np.diff(dst_level)) + 1
+        for level_lo, level_hi in zip(np.r_[0, bounds], np.r_[bounds, len(dst)]):
+            for lo in range(level_lo, level_hi, step):
+                hi = min(lo + step, level_hi)
+                block_dst, block_src = dst[lo:hi], src[lo:hi]
+                values = bits[block_src]
+                values[np.arange(len(block_src)), block_src >> 6] |= np.uint64(1) << (block_src & 63).astype(np.uint64)
+                starts = np.r_[0, np.flatnonzero(np.diff(block_dst)) + 1]
+                # Вершина уровня может попасть в два блока, поэтому OR, а не присваивание
+                bits[block_dst[starts]] |= np.bitwise_or.reduceat(values, starts, axis=0)
+
+    # Является ли x предком y — проверка одного бита
+    def is_ancestor(self, x, y):
+        i, j = self.position[self.graph.index[x]], self.position[self.graph.index[y]]
+        if j < 0:
+            raise KeyError(y)
+        if i < 0:
+            return False  # индекс замкнут вверх: вершина вне его не предок вершин индекса
+        return bool((int(self.ancestors[j, i >> 6]) >> (i & 63)) & 1)
+
+    def is_descendant(self, x, y):
+        return self.is_ancestor(y, x)
+
+    # Число потомков i-й вершины индекса среди вершин индекса на позициях rows
+    # (по умолчанию — всех): подсчёт по столбцам матрицы предков
+    def descendant_counts(self, rows=None):
+        if rows is None:
+            if self._descendant_counts is None:
+                self._descendant_counts = self.descendant_counts(np.arange(len(self.nodes)))
+            return self._descendant_counts
+        return _popcount_columns(self.ancestors, rows)[:len(self.nodes)]
+
+    # Число всех предков и потомков вершин индекса (в порядке nodes)
+    def reachable_counts(self):
+        return self.ancestor_counts, self.descendant_counts()
+
+# Обход в глубину с явным стеком из каждой вершины nodes (по умолчанию — всех),
+# числа всех предков и потомков — списками
+def _search_reachable_counts(graph, nodes=None):
+    def count_related_nodes(node, indptr, indices):
+        visited = {node}
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            for neighbor in indices[indptr[current]:indptr[current + 1]]:
+                if neighbor not in visited:
+                    visited.add(neighbor)
+                    stack.append(neighbor)
+        return len(visited) - 1  # Убираем сам узел
+
+    nodes = range(graph.node_count) if nodes is None else nodes
+    down = graph.children_csr_lists()
+    up = graph.parents_csr_lists()
+    ancestors = [count_related_nodes(node, *up) for node in nodes]
+    descendants = [count_related_nodes(node, *down) for node in nodes]
+    return ancestors, descendants
+
+# Число всех предков и потомков вершин DAG без numpy: множества вершин — биты целых
+# Python, объединяются по топологическому порядку
+def _bitset_reachable_counts(graph, order):
+    indptr, indices = graph.children_csr_lists()
+    ancestors = [0] * graph.node_count
+    for node in order:
+        bits = ancestors[node] | (1 << node)
+        for child in indices[indptr[node]:indptr[node + 1]]:
+            ancestors[child] |= bits
+
+    descendants = [0] * graph.node_count
+    for node in reversed(order):
+        bits = 0
+        for child in indices[indptr[node]:indptr[node + 1]]:
+            bits |= descendants[child] | (1 << child)
+        descendants[node] = bits
+    return [bin(bits).count("1") for bits in ancestors], [bin(bits).count("1") for bits in descendants]
+
+# DAG с вершинами о нескольких родителях. Вершины, недостижимые из таких вершин,
+# образуют лес: их предки — цепочка до корня (глубина), потомки вне этой области —
+# поддерево леса. Битовый индекс строится только для области и всех её предков;
+# если он не помещается в max_index_bytes, эти вершины считаются поиском
+def _dag_reachable_counts(graph, order, max_index_bytes):
+    n = graph.node_count
+    in_degree = graph.in_degree()
+    region = _closure(graph.children_csr(), np.flatnonzero(in_degree > 1), n)
+    related = _closure(graph.parents_csr(), np.flatnonzero(region), n)
+
+    forest = ~region[graph.children]
+    ancestors, descendants = _forest_counts(n, graph.parents[forest], graph.children[forest], order)
+    nodes = np.flatnonzero(related)
+    count("reachable.index_nodes", len(nodes))
+
+    if ReachabilityIndex.estimate_bytes(len(nodes)) > max_index_bytes:
+        count("reachable.search_fallback")
+        ancestors[nodes], descendants[nodes] = _search_reachable_counts(graph, nodes.tolist())
+        return ancestors, descendants
+
+    index = ReachabilityIndex(graph, order, nodes)
+    ancestors[nodes] = index.ancestor_counts
+    # Потомки из области считаются по столбцам её строк, остальные — уже в лесу
+    descendants[nodes] += index.descendant_counts(np.flatnonzero(region[nodes]))
+    return ancestors, descendants
+
+# Строим таблицу с отношениями для каждой вершины
+@profiled("relationship_table", items=len)
+def build_relationship_table(edges):
+    graph = as_graph(edges)
+    columns = graph.relationship_columns
+
+    # Метки из бинарного файла декодируются разом, а не по одной на строку
+    labels = graph.labels if isinstance(graph.labels, list) else list(graph.labels)
+    if columns is None and is_small(graph):
+        sorted_ids = graph.sorted_id_list()
+        columns = [[column[node] for node in sorted_ids] for column in _small_relationship_columns(graph)]
+    else:
+        if columns is None:
+            columns = relationship_columns(graph)
+        columns = [column[graph.sorted_ids()].tolist() for column in columns]
+        sorted_ids = graph.sorted_id_list()
+    return [
+        [labels[node], *row]
+        for node, row in zip(sorted_ids, zip(*columns))
+    ]
+
+# Столбцы r1..r5 малого графа: те же величины, что в relationship_columns, списками
+def _small_relationship_columns(graph):
+    n = graph.node_count
+    parents, children = graph.edge_lists()
+    direct_ancestors = [0] * n
+    direct_descendants = [0] * n
+    for u, v in zip(parents, children):
+        direct_descendants[u] += 1
+        direct_ancestors[v] += 1
+
+    order = topological_order(graph)
+    with stage("reachable_counts", items=n):
+        if order is None:
+            all_ancestors, all_descendants = _search_reachable_counts(graph)
+        else:
+            all_ancestors, all_descendants = _bitset_reachable_counts(graph, order)
+
+    siblings = [0] * n
+    for u, v in zip(parents, children):
+        siblings[v] += direct_descendants[u] - 1
+    return [
+        direct_ancestors,
+        direct_descendants,
+        [total - direct for total, direct in zip(all_ancestors, direct_ancestors)],
+        [total - direct for total, direct in zip(all_descendants, direct_descendants)],
+        siblings,
+    ]
+
+# Столбцы r1..r5 по номерам вершин, массив 5 x n
+def relationship_columns(graph, max_index_bytes=REACHABILITY_INDEX_MAX_BYTES):
+    # Прямые предки и прямые потомки
+    direct_ancestors = graph.in_degree()
+    direct_descendants = graph.out_degree()
+
+    # Число всех предков и потомков каждой вершины: для деревьев — глубина и размер
+    # поддерева, для DAG — то же вне области вершин с несколькими родителями и битовый
+    # индекс достижимости внутри неё, для графов с циклами — поиск
+    order = topological_order(graph)
+    with stage("reachable_counts", items=graph.node_count):
+        if order is None:
+            all_ancestors, all_descendants = (np.array(counts, dtype=np.int64) for counts in _search_reachable_counts(graph))
+        elif direct_ancestors.max(initial=0) <= 1:
+            all_ancestors, all_descendants = tree_reachable_counts(graph, order)
+        else:
+            all_ancestors, all_descendants = _dag_reachable_counts(graph, order, max_index_bytes)
+
+    # Непрямые предки и потомки
+    indirect_ancestors = all_ancestors - direct_ancestors
+    indirect_descendants = all_descendants - direct_descendants
+
+    # Братья: для каждого ребра (родитель, вершина) — остальные дети родителя
+    siblings = np.bincount(
+        graph.children, weights=direct_descendants[graph.parents] - 1, minlength=graph.node_count
+    ).astype(np.int64)
+
+    return np.stack([direct_ancestors, direct_descendants, indirect_ancestors, indirect_descendants, siblings])
@@ -0,0 +1,154 @@
+import mmap
+import struct
+from collections.abc import Sequence
+
+from common.graph import Graph, relationship_columns
+from common.lazy import lazy_import
+from common.profiling import profiled
+
+np = lazy_import("numpy")
+
+# Бинарный формат графа для повторных запусков без разбора JSON. Файл читается
+# через mmap, массивы numpy смотрят прямо в отображённые страницы (без копий),
+# поэтому открытие занимает миллисекунды, а процессы пула делят одни страницы.
+#
+# Заголовок (little-endian): магия, версия, флаги, n вершин, m рёбер, байт меток.
+# Далее секции, каждая выровнена на 8 байт:
+#   label_offsets  int64[n + 1]  границы меток в label_data
+#   sorted_ids     int32[n]      номера вершин в порядке сортировки меток
+#   parents        int32[m]
+#   children       int32[m]
+#   label_data     uint8[...]    метки в UTF-8 подряд
+#   relationships  int32[5 * n]  столбцы r1..r5 по номерам вершин (флаг FLAG_RELATIONSHIPS)
+
+MAGIC = b"SAGRAPH\0"
+GRAPH_FILE_SUFFIX = ".sag"
+VERSION = 1
+FLAG_RELATIONSHIPS = 1
+_HEADER = struct.Struct("<8sIIqqq")
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+# Смещения секций по размерам из заголовка
+def _layout(n, m, label_bytes, flags):
+    sections = {}
+    offset = _aligned(_HEADER.size)
+    for name, size in (
+        ("label_offsets", 8 * (n + 1)),
+        ("sorted_ids", 4 * n),
+        ("parents", 4 * m),
+        ("children", 4 * m),
+        ("label_data", label_bytes),
+        ("relationships", 4 * 5 * n if flags & FLAG_RELATIONSHIPS else 0),
+    ):
+        sections[name] = (offset, size)
+        offset = _aligned(offset + size)
+    return sections, offset
+
+
+# Метки из файла: строка декодируется при обращении, целиком таблица не читается
+class LabelTable(Sequence):
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __iter__(self):
+        data = bytes(self.data)
+        bounds = self.offsets.tolist()
+        for start, end in zip(bounds, bounds[1:]):
+            yield data[start:end].decode("utf-8")
+
+
+# Запись графа; relationships=True сохраняет и столбцы таблицы отношений
+@profiled("graphfile.write")
+def write_graph(path, graph, relationships=False):
+    labels = [label.encode("utf-8") if isinstance(label, str) else None for label in graph.labels]
+    if any(label is None for label in labels):
+        raise ValueError("В бинарном формате метки вершин должны быть строками")
+    n, m = graph.node_count, graph.edge_count
+    label_offsets = np.zeros(n + 1, dtype="<i8")
+    np.cumsum([len(label) for label in labels], out=label_offsets[1:])
+    label_bytes = int(label_offsets[-1])
+
+    flags = FLAG_RELATIONSHIPS if relationships else 0
+    columns = graph.relationship_columns
+    if relationships and columns is None:
+        columns = relationship_columns(graph)
+
+    sections, total = _layout(n, m, label_bytes, flags)
+    payload = {
+        "label_offsets": label_offsets.tobytes(),
+        "sorted_ids": np.asarray(graph.sorted_ids(), dtype="<i4").tobytes(),
+        "parents": np.asarray(graph.parents, dtype="<i4").tobytes(),
+        "children": np.asarray(graph.children, dtype="<i4").tobytes(),
+        "label_data": b"".join(labels),
+    }
+    if relationships:
+        payload["relationships"] = np.asarray(columns, dtype="<i4").tobytes()
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, flags, n, m, label_bytes))
+        for name, (offset, _) in sections.items():
+            if name in payload:
+                f.seek(offset)
+                f.write(payload[name])
+        f.truncate(total)
+
+# Открытие графа через mmap. Массивы графа — представления страниц файла,
+# отображение живёт, пока жив граф
+@profiled("graphfile.open")
+def open_graph(path):
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buffer) < _HEADER.size:
+        raise ValueError(f"{path}: файл слишком короткий для графа")
+    magic, version, flags, n, m, label_bytes = _HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path}: это не бинарный граф")
+    if version != VERSION:
+        raise ValueError(f"{path}: неподдерживаемая версия формата {version}")
+    sections, total = _layout(n, m, label_bytes, flags)
+    if len(buffer) < total:
+        raise ValueError(f"{path}: файл обрезан")
+
+    def section(name, dtype, count):
+        return np.frombuffer(buffer, dtype=dtype, count=count, offset=sections[name][0])
+
+    label_offsets = section("label_offsets", "<i8", n + 1)
+    relationships = section("relationships", "<i4", 5 * n).reshape(5, n) if flags & FLAG_RELATIONSHIPS else None
+    return Graph(
+        LabelTable(label_offsets, section("label_data", np.uint8, label_bytes)),
+        section("parents", "<i4", m),
+        section("children", "<i4", m),
+        sorted_ids=section("sorted_ids", "<i4", n),
+        relationship_columns=relationships,
+    )
+
+def is_graph_file(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+# Конвертер вложенного JSON задачи в бинарный формат. Файл разбирается потоково,
+# кусками: в памяти только граф, а не текст документа и дерево словарей json.loads
+def convert_json(json_path, output_path, relationships=True):
+    with open(json_path, encoding="utf-8") as f:
+        graph = Graph.from_stream(f)
+    write_graph(output_path, graph, relationships)
+    return graph
@@ -0,0 +1,19 @@
+import importlib
+import sys
+import types
+
+# Отложенный импорт тяжёлых модулей (numpy): модуль загружается при первом
+# обращении к атрибуту, после чего его атрибуты копируются в заглушку и
+# дальнейшие обращения идут напрямую, без __getattr__
+
+
+class LazyModule(types.ModuleType):
+    def __getattr__(self, name):
+        module = importlib.import_module(self.__name__)
+        self.__dict__.update(module.__dict__)
+        return getattr(module, name)
+
+
+def lazy_import(name):
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,113 @@
+import csv
+import json
+import sys
+
+from common.profiling import profiled
+
+# Приёмники результатов для main в task1-task3. Этапы передают результаты в приёмник
+# по мере готовности, а он решает, что и в каком виде выводить.
+# Базовый приёмник ничего не выводит (тихий режим)
+class OutputSink:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def edges(self, graph):
+        pass
+
+    def adjacency_matrix(self, matrix):
+        pass
+
+    def adjacency_list(self, adjacency_list):
+        pass
+
+    def relationship_table(self, rows):
+        pass
+
+    def entropy(self, values):
+        pass
+
+
+RELATIONSHIP_HEADERS = ["Node", "r1", "r2", "r3", "r4", "r5"]
+ENTROPY_HEADERS = ["r1", "r2", "r3", "r4", "r5"]
+
+
+# Полный вывод в консоль, как раньше: рёбра, матрица, список смежности, таблица, энтропия
+class ConsoleSink(OutputSink):
+    def __init__(self, stream=None, separator="\n"):
+        super().__init__(stream)
+        self.separator = separator
+
+    def edges(self, graph):
+        print("Edges:", list(graph.edges()), file=self.stream)
+
+    @profiled("output.adjacency_matrix")
+    def adjacency_matrix(self, matrix):
+        print(f"{self.separator}Adjacency Matrix:", file=self.stream)
+        for row in matrix:
+            print(row, file=self.stream)
+
+    def adjacency_list(self, adjacency_list):
+        print(f"{self.separator}Adjacency List:", file=self.stream)
+        for node in sorted(adjacency_list):
+            print(f"{node}: {adjacency_list[node]}", file=self.stream)
+
+    @profiled("output.tabulate")
+    def relationship_table(self, rows):
+        from tabulate import tabulate
+
+        print(f"{self.separator}Relationship Table:", file=self.stream)
+        print(tabulate(rows, headers=RELATIONSHIP_HEADERS, tablefmt="grid"), file=self.stream)
+
+    def entropy(self, values):
+        print("\nEntropy:", sum(e for e in values), file=self.stream)
+        for header, value in zip(ENTROPY_HEADERS, values):
+            print(f"{header}: {value:.4f}", file=self.stream)
+
+
+# Только размеры графа и итоговая энтропия
+class SummarySink(OutputSink):
+    def edges(self, graph):
+        print(f"Nodes: {graph.node_count}, edges: {graph.edge_count}", file=self.stream)
+
+    def entropy(self, values):
+        print(f"Entropy: {sum(values):.4f}", file=self.stream)
+        for header, value in zip(ENTROPY_HEADERS, values):
+            print(f"{header}: {value:.4f}", file=self.stream)
+
+
+# Строки таблицы отношений в CSV, запись построчно
+class CsvSink(OutputSink):
+    @profiled("output.csv")
+    def relationship_table(self, rows):
+        writer = csv.writer(self.stream)
+        writer.writerow(RELATIONSHIP_HEADERS)
+        for row in rows:
+            writer.writerow(row)
+
+
+# Строки таблицы отношений и энтропия как NDJSON, одна запись на строку
+class NdjsonSink(OutputSink):
+    def _write(self, record):
+        self.stream.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @profiled("output.ndjson")
+    def relationship_table(self, rows):
+        for row in rows:
+            self._write(dict(zip(["node", "r1", "r2", "r3", "r4", "r5"], row)))
+
+    def entropy(self, values):
+        record = dict(zip(ENTROPY_HEADERS, values))
+        record["total"] = sum(values)
+        self._write({"entropy": record})
+
+
+SINKS = {
+    "console": ConsoleSink,
+    "summary": SummarySink,
+    "silent": OutputSink,
+    "csv": CsvSink,
+    "ndjson": NdjsonSink,
+}
+
+def make_sink(name, stream=None):
+    return SINKS[name](stream)
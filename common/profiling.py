@@ -0,0 +1,228 @@
+import functools
+import importlib
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+from common.lazy import lazy_import
+
+tracemalloc = lazy_import("tracemalloc")
+
+# Лёгкая инструментовка этапов: время, число вызовов, число обработанных элементов
+# и (по желанию) пик памяти tracemalloc. Пока профилировщик выключен, stage()
+# возвращает общий пустой контекст, а обёртка profiled — сразу вызывает функцию,
+# так что в обычных запусках остаётся одна проверка флага на вызов
+
+
+# Накопленные значения одного этапа
+class StageStats:
+    __slots__ = ("calls", "seconds", "items", "peak_bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.items = 0
+        self.peak_bytes = None
+
+    def as_dict(self):
+        return {"calls": self.calls, "seconds": self.seconds, "items": self.items, "peak_bytes": self.peak_bytes}
+
+
+# Пустой этап для выключенного профилировщика
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, items):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+# Один замер этапа. Вложенные этапы получают имя "внешний/внутренний".
+# Пик памяти — прирост над уровнем на входе в этап; пики вложенных этапов
+# учитываются во внешнем, хотя tracemalloc.reset_peak сбрасывается на каждом входе
+class _Stage:
+    __slots__ = ("profiler", "name", "items", "path", "started", "memory_start", "memory_peak")
+
+    def __init__(self, profiler, name, items):
+        self.profiler = profiler
+        self.name = name
+        self.items = items or 0
+
+    def add(self, items):
+        self.items += items
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.path = f"{stack[-1].path}/{self.name}" if stack else self.name
+        self.profiler._register(self.path)
+        if self.profiler.trace_memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, peak)
+            tracemalloc.reset_peak()
+            self.memory_start = self.memory_peak = current
+        else:
+            self.memory_start = None
+        stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stack = self.profiler._stack()
+        stack.pop()
+        peak = None
+        if self.memory_start is not None and tracemalloc.is_tracing():
+            _, traced_peak = tracemalloc.get_traced_memory()
+            self.memory_peak = max(self.memory_peak, traced_peak)
+            peak = self.memory_peak - self.memory_start
+            tracemalloc.reset_peak()
+            if stack and stack[-1].memory_start is not None:
+                stack[-1].memory_peak = max(stack[-1].memory_peak, self.memory_peak)
+        self.profiler._record(self.path, elapsed, self.items, peak)
+        return False
+
+
+# Модули, которые задачи загружают лениво. При включении профилировщика они
+# импортируются сразу, отдельным этапом "import ...": иначе время импорта попало бы
+# в первый этап, обратившийся к модулю (graph.intern на дереве из 7 рёбер)
+PRELOADED_MODULES = ("numpy",)
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace_memory = False
+        self._started_tracing = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.counters = Counter()
+
+    def enable(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self.enabled = True
+        for name in PRELOADED_MODULES:
+            if name not in sys.modules:
+                with self.stage(f"import {name}"):
+                    importlib.import_module(name)
+
+    def disable(self):
+        self.enabled = False
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    # Этапы регистрируются при входе, чтобы в отчёте внешний шёл раньше вложенных
+    def _register(self, path):
+        if path not in self.stages:
+            with self._lock:
+                self.stages.setdefault(path, StageStats())
+
+    def _record(self, path, seconds, items, peak):
+        with self._lock:
+            stats = self.stages[path]
+            stats.calls += 1
+            stats.seconds += seconds
+            stats.items += items
+            if peak is not None:
+                stats.peak_bytes = peak if stats.peak_bytes is None else max(stats.peak_bytes, peak)
+
+    # Этап как контекст: with profiler.stage("json.loads", items=n) as s: ...; s.add(k)
+    def stage(self, name, items=None):
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, items)
+
+    # Счётчик событий вне этапов (сработавшие правила, пропущенные записи и т.п.)
+    def count(self, name, items=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += items
+
+    def report(self):
+        with self._lock:
+            return {
+                "stages": [{"stage": path, **stats.as_dict()} for path, stats in self.stages.items()],
+                "counters": dict(self.counters),
+            }
+
+    def dump(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+
+    # Текстовая сводка: этапы в порядке первого входа, вложенные — с отступом
+    def format_report(self):
+        report = self.report()
+        lines = [f"{'stage':40} {'calls':>8} {'seconds':>10} {'items':>12} {'peak MiB':>9}"]
+        for stage in report["stages"]:
+            depth = stage["stage"].count("/")
+            name = "  " * depth + stage["stage"].rsplit("/", 1)[-1]
+            peak = "" if stage["peak_bytes"] is None else f"{stage['peak_bytes'] / 2**20:.1f}"
+            lines.append(f"{name:40} {stage['calls']:>8} {stage['seconds']:>10.4f} {stage['items']:>12} {peak:>9}")
+        for name, value in report["counters"].items():
+            lines.append(f"{name:40} {value:>8}")
+        return "\n".join(lines)
+
+
+# Общий профилировщик процесса
+profiler = Profiler()
+stage = profiler.stage
+count = profiler.count
+
+
+# Декоратор этапа: items(result) — число обработанных элементов по результату функции
+def profiled(name, items=None):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with profiler.stage(name) as current:
+                result = func(*args, **kwargs)
+                if items is not None:
+                    current.add(items(result))
+                return result
+        return wrapper
+    return decorate
+
+
+# Параметр --profile для командной строки задач: без значения — сводка в stderr,
+# со значением — отчёт JSON в файл; --profile-memory добавляет пики tracemalloc
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", nargs="?", const="-", default=None, metavar="FILE",
+                        help="замерить этапы: сводка в stderr или отчёт JSON в FILE")
+    parser.add_argument("--profile-memory", action="store_true", help="пики памяти этапов (tracemalloc)")
+
+def start_profiling(args):
+    if args.profile is not None or args.profile_memory:
+        profiler.enable(trace_memory=args.profile_memory)
+
+def finish_profiling(args, stream=None):
+    if not profiler.enabled:
+        return
+    if args.profile in (None, "-"):
+        print(profiler.format_report(), file=stream or sys.stderr)
+    else:
+        profiler.dump(args.profile)
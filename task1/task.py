@@ -1,73 +1,39 @@
-import json
+import argparse
+import os
+import sys
 
-# Преобразование JSON в список рёбер
-def json_to_edges(input_str):
-    data = json.loads(input_str)
-    
-    edges = []
-
-    # Рекурсивная функция для обхода дерева и извлечения рёбер
-    def traverse(parent, subtree):
-        for child in subtree:
-            edges.append((parent, child))
-            traverse(child, subtree[child])
-
-    # Начинаем обход с корня
-    for root in data:
-        traverse(root, data[root])
+# Только при запуске файлом (python task1/task.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-    return edges
-
-# Преобразование списка рёбер в матрицу смежности
-def edges_to_adjacency_matrix(edges):
-    # Находим все уникальные узлы
-    nodes = set()
-    for u, v in edges:
-        nodes.add(u)
-        nodes.add(v)
-    
-    node_list = sorted(nodes)  # Сортируем для упорядочивания узлов
-    node_index = {node: idx for idx, node in enumerate(node_list)}
-    n = len(node_list)
-    
-    matrix = [[0] * n for _ in range(n)]
-    
-    for u, v in edges:
-        matrix[node_index[u]][node_index[v]] = 1  # Если есть ребро, ставим 1
-    
-    return matrix
+from common.graph import Graph, edges_to_adjacency_list, edges_to_adjacency_matrix, json_to_edges
+from common.output import SINKS, ConsoleSink, make_sink
+from common.profiling import add_profile_arguments, finish_profiling, profiled, start_profiling
 
-# Преобразование списка рёбер в список смежности
-def edges_to_adjacency_list(edges):
-    adjacency_list = {}
-    
-    for u, v in edges:
-        if u not in adjacency_list:
-            adjacency_list[u] = []
-        adjacency_list[u].append(v)
-    
-    return adjacency_list
+@profiled("task1")
+def main(input_str, sink=None):
+    sink = sink or ConsoleSink(separator="")
 
-def main(input_str):
-    # Преобразуем JSON в список рёбер
-    edges = json_to_edges(input_str)
-    print("Edges:", edges)
+    # Преобразуем JSON в граф с интернированными вершинами (граф из бинарного файла — как есть)
+    graph = input_str if isinstance(input_str, Graph) else Graph.from_json(input_str)
+    sink.edges(graph)
 
     # Преобразуем список рёбер в матрицу смежности
-    adjacency_matrix = edges_to_adjacency_matrix(edges)
-    print("Adjacency Matrix:")
-    for row in adjacency_matrix:
-        print(row)
+    adjacency_matrix = edges_to_adjacency_matrix(graph)
+    sink.adjacency_matrix(adjacency_matrix)
 
     # Преобразуем список рёбер в список смежности
-    adjacency_list = edges_to_adjacency_list(edges)
-    print("Adjacency List:")
-    for node in sorted(adjacency_list):
-        print(f"{node}: {adjacency_list[node]}")
+    adjacency_list = edges_to_adjacency_list(graph)
+    sink.adjacency_list(adjacency_list)
     
     return adjacency_list, adjacency_matrix
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Матрица и список смежности дерева")
+    parser.add_argument("-o", "--output", choices=sorted(SINKS), default="console", help="режим вывода")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
     input_str = """{
         "1": {
             "2": {
@@ -83,4 +49,5 @@ if __name__ == "__main__":
         }
     }"""
 
-    main(input_str)
+    main(input_str, ConsoleSink(separator="") if args.output == "console" else make_sink(args.output))
+    finish_profiling(args)
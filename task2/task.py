@@ -1,136 +1,53 @@
-import json
-from tabulate import tabulate
-
-# Преобразование JSON в список рёбер
-def json_to_edges(input_str):
-    data = json.loads(input_str)
-    
-    edges = []
-
-    def traverse(parent, subtree):
-        for child in subtree:
-            edges.append((parent, child))
-            traverse(child, subtree[child])
-
-    for root in data:
-        traverse(root, data[root])
-
-    return edges
-
-# Преобразование списка рёбер в матрицу смежности
-def edges_to_adjacency_matrix(edges):
-    nodes = set()
-    for u, v in edges:
-        nodes.add(u)
-        nodes.add(v)
-    
-    node_list = sorted(nodes)
-    node_index = {node: idx for idx, node in enumerate(node_list)}
-    n = len(node_list)
-    
-    matrix = [[0] * n for _ in range(n)]
-    
-    for u, v in edges:
-        matrix[node_index[u]][node_index[v]] = 1
-    
-    return matrix
-
-# Преобразование списка рёбер в список смежности
-def edges_to_adjacency_list(edges):
-    adjacency_list = {}
-    
-    # Строим список смежности
-    for u, v in edges:
-        if u not in adjacency_list:
-            adjacency_list[u] = []
-        adjacency_list[u].append(v)
-    
-    return adjacency_list
-
-# Строим таблицу с отношениями для каждой вершины
-def build_relationship_table(edges):
-    adjacency_list = edges_to_adjacency_list(edges)
-
-    # Создание обратного списка смежности (для предков)
-    reverse_adjacency_list = {}
-    for u, v in edges:
-        if v not in reverse_adjacency_list:
-            reverse_adjacency_list[v] = []
-        reverse_adjacency_list[v].append(u)
-
-    # Функция для вычисления всех предков/потомков
-    def get_all_related_nodes(node, adj_list, visited):
-        if node in visited:
-            return
-        visited.add(node)
-        for neighbor in adj_list.get(node, []):
-            get_all_related_nodes(neighbor, adj_list, visited)
-
-    relationship_table = []
-    all_nodes = set(adjacency_list.keys()).union(reverse_adjacency_list.keys())
-
-    for node in sorted(all_nodes):
-        # Прямые потомки
-        direct_descendants = len(adjacency_list.get(node, []))
-        # Прямые предки
-        direct_ancestors = len(reverse_adjacency_list.get(node, []))
-
-        # Непрямые потомки
-        visited_descendants = set()
-        get_all_related_nodes(node, adjacency_list, visited_descendants)
-        visited_descendants.discard(node)  # Убираем сам узел
-        indirect_descendants = len(visited_descendants) - direct_descendants
-
-        # Непрямые предки
-        visited_ancestors = set()
-        get_all_related_nodes(node, reverse_adjacency_list, visited_ancestors)
-        visited_ancestors.discard(node)  # Убираем сам узел
-        indirect_ancestors = len(visited_ancestors) - direct_ancestors
-
-        # Братья
-        siblings = 0
-        for parent in reverse_adjacency_list.get(node, []):
-            siblings += len(adjacency_list.get(parent, [])) - 1
-
-        relationship_table.append([
-            node,
-            direct_ancestors,
-            direct_descendants,
-            indirect_ancestors,
-            indirect_descendants,
-            siblings
-        ])
-
-    return relationship_table
-
-
-def main(input_str):
-    # Преобразуем JSON в список рёбер
-    edges = json_to_edges(input_str)
-    print("Edges:", edges)
+import argparse
+import os
+import sys
+
+# Только при запуске файлом (python task2/task.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.cache import AnalysisCache, cached, graph_key
+from common.graph import (
+    Graph,
+    ReachabilityIndex,
+    build_relationship_table,
+    edges_to_adjacency_list,
+    edges_to_adjacency_matrix,
+    json_to_edges,
+)
+from common.output import SINKS, ConsoleSink, make_sink
+from common.profiling import add_profile_arguments, finish_profiling, profiled, start_profiling
+
+
+@profiled("task2")
+def main(input_str, sink=None, cache=None):
+    sink = sink or ConsoleSink()
+
+    # Преобразуем JSON в граф с интернированными вершинами (граф из бинарного файла — как есть)
+    graph = input_str if isinstance(input_str, Graph) else Graph.from_json(input_str)
+    sink.edges(graph)
 
     # Преобразуем список рёбер в матрицу смежности
-    adjacency_matrix = edges_to_adjacency_matrix(edges)
-    print("\nAdjacency Matrix:")
-    for row in adjacency_matrix:
-        print(row)
+    adjacency_matrix = edges_to_adjacency_matrix(graph)
+    sink.adjacency_matrix(adjacency_matrix)
 
     # Преобразуем список рёбер в список смежности
-    adjacency_list = edges_to_adjacency_list(edges)
-    print("\nAdjacency List:")
-    for node in sorted(adjacency_list):
-        print(f"{node}: {adjacency_list[node]}")
+    adjacency_list = edges_to_adjacency_list(graph)
+    sink.adjacency_list(adjacency_list)
 
-    # Строим таблицу с отношениями
-    relationship_table = build_relationship_table(edges)
-    
-    # Выводим таблицу с использованием tabulate
-    headers = ["Node", "r1", "r2", "r3", "r4", "r5"]
-    print("\nRelationship Table:")
-    print(tabulate(relationship_table, headers=headers, tablefmt="grid"))
+    # Строим таблицу с отношениями (или берём из кэша по содержимому графа)
+    key = graph_key(graph) if cache is not None else None
+    relationship_table = cached(cache, key, "table", lambda: build_relationship_table(graph))
+    sink.relationship_table(relationship_table)
     return relationship_table
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Таблица отношений вершин дерева")
+    parser.add_argument("-o", "--output", choices=sorted(SINKS), default="console", help="режим вывода")
+    parser.add_argument("--cache", default=None, metavar="FILE", help="кэш результатов в файле SQLite")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
     input_str = """{
         "1": {
             "2": {
@@ -145,4 +62,5 @@ if __name__ == "__main__":
             }
         }
     }"""
-    main(input_str)
+    main(input_str, make_sink(args.output), AnalysisCache(path=args.cache) if args.cache else None)
+    finish_profiling(args)
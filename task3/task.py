@@ -1,111 +1,37 @@
+import argparse
+import itertools
 import json
 import math
-from tabulate import tabulate
-
-# Преобразование JSON в список рёбер
-def json_to_edges(input_str):
-    data = json.loads(input_str)
-    
-    edges = []
-
-    def traverse(parent, subtree):
-        for child in subtree:
-            edges.append((parent, child))
-            traverse(child, subtree[child])
-
-    for root in data:
-        traverse(root, data[root])
-
-    return edges
-
-# Преобразование списка рёбер в матрицу смежности
-def edges_to_adjacency_matrix(edges):
-    nodes = set()
-    for u, v in edges:
-        nodes.add(u)
-        nodes.add(v)
-    
-    node_list = sorted(nodes)
-    node_index = {node: idx for idx, node in enumerate(node_list)}
-    n = len(node_list)
-    
-    matrix = [[0] * n for _ in range(n)]
-    
-    for u, v in edges:
-        matrix[node_index[u]][node_index[v]] = 1
-    
-    return matrix
-
-# Преобразование списка рёбер в список смежности
-def edges_to_adjacency_list(edges):
-    adjacency_list = {}
-    
-    # Строим список смежности
-    for u, v in edges:
-        if u not in adjacency_list:
-            adjacency_list[u] = []
-        adjacency_list[u].append(v)
-    
-    return adjacency_list
-
-# Строим таблицу с отношениями для каждой вершины
-def build_relationship_table(edges):
-    adjacency_list = edges_to_adjacency_list(edges)
-
-    # Создание обратного списка смежности (для предков)
-    reverse_adjacency_list = {}
-    for u, v in edges:
-        if v not in reverse_adjacency_list:
-            reverse_adjacency_list[v] = []
-        reverse_adjacency_list[v].append(u)
-
-    # Функция для вычисления всех предков/потомков
-    def get_all_related_nodes(node, adj_list, visited):
-        if node in visited:
-            return
-        visited.add(node)
-        for neighbor in adj_list.get(node, []):
-            get_all_related_nodes(neighbor, adj_list, visited)
-
-    relationship_table = []
-    all_nodes = set(adjacency_list.keys()).union(reverse_adjacency_list.keys())
-
-    for node in sorted(all_nodes):
-        # Прямые потомки
-        direct_descendants = len(adjacency_list.get(node, []))
-        # Прямые предки
-        direct_ancestors = len(reverse_adjacency_list.get(node, []))
-
-        # Непрямые потомки
-        visited_descendants = set()
-        get_all_related_nodes(node, adjacency_list, visited_descendants)
-        visited_descendants.discard(node)  # Убираем сам узел
-        indirect_descendants = len(visited_descendants) - direct_descendants
-
-        # Непрямые предки
-        visited_ancestors = set()
-        get_all_related_nodes(node, reverse_adjacency_list, visited_ancestors)
-        visited_ancestors.discard(node)  # Убираем сам узел
-        indirect_ancestors = len(visited_ancestors) - direct_ancestors
-
-        # Братья
-        siblings = 0
-        for parent in reverse_adjacency_list.get(node, []):
-            siblings += len(adjacency_list.get(parent, [])) - 1
-
-        relationship_table.append([
-            node,
-            direct_ancestors,
-            direct_descendants,
-            indirect_ancestors,
-            indirect_descendants,
-            siblings
-        ])
-
-    return relationship_table
+import os
+import pathlib
+import sys
+from collections import deque
+
+# Только при запуске файлом (python task3/task.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.cache import AnalysisCache, cached, graph_key
+from common.graph import (
+    Graph,
+    ReachabilityIndex,
+    build_relationship_table,
+    edges_to_adjacency_list,
+    edges_to_adjacency_matrix,
+    json_to_edges,
+    topological_order,
+    tree_reachable_counts,
+)
+from common.graphfile import GRAPH_FILE_SUFFIX, open_graph
+from common.lazy import lazy_import
+from common.output import SINKS, ConsoleSink, make_sink
+from common.profiling import add_profile_arguments, count, finish_profiling, profiled, stage, start_profiling
+
+np = lazy_import("numpy")
 
 
 # Вычисление энтропии по формуле Шеннона
+@profiled("entropy")
 def calculate_entropy(relationship_table):
     # Транспонируем таблицу для удобства работы с отношениями по столбцам
     columns = list(zip(*relationship_table))[1:]  # Пропускаем первый столбец (номер вершины)
@@ -126,42 +52,312 @@ def calculate_entropy(relationship_table):
 
     return entropy_values
 
-def main(input_str):
-    # Преобразуем JSON в список рёбер
-    edges = json_to_edges(input_str)
-    print("Edges:", edges)
+# Столбцы r1..r5 таблицы отношений как целочисленный массив n x 5
+def relationship_table_to_array(relationship_table):
+    return np.array([row[1:] for row in relationship_table], dtype=np.int64).reshape(-1, 5)
+
+# -p*log2(p) для каждого элемента, нули и пустые столбцы дают 0
+def _entropy_terms(values, totals):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p = np.divide(values, totals, out=np.zeros_like(values), where=totals != 0)
+        return np.where(p > 0, -p * np.log2(p, where=p > 0, out=np.ones_like(p)), 0.0)
+
+# Векторное вычисление энтропии всех столбцов таблицы за один вызов
+@profiled("entropy_array")
+def calculate_entropy_array(relationship_array):
+    values = np.asarray(relationship_array, dtype=np.float64)
+    return _entropy_terms(values, values.sum(axis=0)).sum(axis=0)
+
+# Энтропия для набора таблиц: массив g x n x 5 или список таблиц разной длины
+def calculate_entropy_batch(relationship_arrays):
+    if isinstance(relationship_arrays, np.ndarray) and relationship_arrays.ndim == 3:
+        values = relationship_arrays.astype(np.float64)
+        return _entropy_terms(values, values.sum(axis=1, keepdims=True)).sum(axis=1)
+
+    arrays = [np.asarray(array, dtype=np.float64).reshape(-1, 5) for array in relationship_arrays]
+    lengths = np.array([len(array) for array in arrays], dtype=np.int64)
+    result = np.zeros((len(arrays), 5))
+    if not lengths.any():
+        return result
+
+    # Таблицы склеиваются в один массив, суммы по таблицам — через reduceat по границам
+    values = np.concatenate(arrays)
+    non_empty = lengths > 0
+    starts = np.r_[0, np.cumsum(lengths)[:-1]][non_empty]
+    totals = np.add.reduceat(values, starts, axis=0)
+    terms = _entropy_terms(values, np.repeat(totals, lengths[non_empty], axis=0))
+    result[non_empty] = np.add.reduceat(terms, starts, axis=0)
+    return result
+
+
+# Иерархия (лес) с инкрементальным пересчётом таблицы отношений и энтропии.
+# Для каждой вершины хранятся глубина и размер поддерева, при изменении ребра
+# пересчитываются только строки предков, поддерева и братьев затронутой вершины.
+# По столбцам хранятся суммы v и v*log2(v): H = log2(T) - S / T
+class IncrementalHierarchy:
+    def __init__(self, edges=()):
+        self.parent = {}
+        self.children = {}
+        self.depth = {}
+        self.size = {}
+        self.rows = {}
+        self.column_totals = [0] * 5
+        self.column_log_sums = [0.0] * 5
+
+        for u, v in edges:
+            if v in self.parent:
+                raise ValueError(f"У вершины {v!r} уже есть родитель {self.parent[v]!r}")
+            self.parent[v] = u
+            self.children.setdefault(u, []).append(v)
+            self.children.setdefault(v, [])
+
+        graph = Graph.from_edges((u, v) for v, u in self.parent.items())
+        order = topological_order(graph)
+        if order is None:
+            raise ValueError("Граф содержит цикл")
+        depth, descendants = tree_reachable_counts(graph, order)
+        self.depth = dict(zip(graph.labels, depth.tolist()))
+        self.size = dict(zip(graph.labels, (descendants + 1).tolist()))
+        self._refresh(list(self.children))
+
+    # Вершина и все её предки
+    def _path_to_root(self, node):
+        path = []
+        while node is not None:
+            path.append(node)
+            node = self.parent.get(node)
+        return path
+
+    # Вершина и все её потомки
+    def _subtree(self, node):
+        subtree = [node]
+        for current in subtree:
+            subtree.extend(self.children[current])
+        return subtree
+
+    def _account(self, row, sign):
+        for k, value in enumerate(row[1:]):
+            self.column_totals[k] += sign * value
+            if value > 0:
+                self.column_log_sums[k] += sign * value * math.log2(value)
+
+    # Пересчёт строк переданных вершин, изолированные вершины удаляются из таблицы
+    def _refresh(self, nodes):
+        for node in nodes:
+            old_row = self.rows.pop(node, None)
+            if old_row is not None:
+                self._account(old_row, -1)
+
+            parent = self.parent.get(node)
+            children = self.children.get(node)
+            if parent is None and not children:
+                if children is not None:
+                    del self.children[node], self.depth[node], self.size[node]
+                continue
+
+            direct_ancestors = 0 if parent is None else 1
+            direct_descendants = len(children)
+            row = [
+                node,
+                direct_ancestors,
+                direct_descendants,
+                self.depth[node] - direct_ancestors,
+                self.size[node] - 1 - direct_descendants,
+                0 if parent is None else len(self.children[parent]) - 1,
+            ]
+            self.rows[node] = row
+            self._account(row, 1)
+
+    def add_edge(self, u, v):
+        if v in self.parent:
+            raise ValueError(f"У вершины {v!r} уже есть родитель {self.parent[v]!r}")
+        path = self._path_to_root(u)
+        if v in path:
+            raise ValueError(f"Ребро ({u!r}, {v!r}) образует цикл")
+
+        for node in (u, v):
+            if node not in self.children:
+                self.children[node] = []
+                self.depth[node] = 0
+                self.size[node] = 1
+
+        siblings = list(self.children[u])
+        self.children[u].append(v)
+        self.parent[v] = u
+
+        subtree = self._subtree(v)
+        shift = self.depth[u] + 1
+        for node in subtree:
+            self.depth[node] += shift
+        for node in path:
+            self.size[node] += self.size[v]
+
+        self._refresh(path + subtree + siblings)
+
+    def remove_edge(self, u, v):
+        if self.parent.get(v) != u or u is None:
+            raise ValueError(f"Ребра ({u!r}, {v!r}) нет в иерархии")
+        path = self._path_to_root(u)
+
+        self.children[u].remove(v)
+        del self.parent[v]
+
+        subtree = self._subtree(v)
+        shift = self.depth[v]
+        for node in subtree:
+            self.depth[node] -= shift
+        for node in path:
+            self.size[node] -= self.size[v]
+
+        self._refresh(path + subtree + self.children[u])
+
+    # Перенос вершины вместе с поддеревом под нового родителя
+    def move_subtree(self, node, new_parent):
+        if node in self._path_to_root(new_parent):
+            raise ValueError(f"Нельзя перенести {node!r} в собственное поддерево")
+        old_parent = self.parent.get(node)
+        if old_parent is not None:
+            self.remove_edge(old_parent, node)
+        self.add_edge(new_parent, node)
+
+    # Таблица в том же виде, что возвращает build_relationship_table
+    def relationship_table(self):
+        return [list(self.rows[node]) for node in sorted(self.rows)]
+
+    # Энтропия столбцов r1..r5, как в calculate_entropy
+    def entropy(self):
+        return [
+            math.log2(total) - log_sum / total if total > 0 else 0
+            for total, log_sum in zip(self.column_totals, self.column_log_sums)
+        ]
+
+
+@profiled("task3")
+def main(input_str, sink=None, cache=None):
+    sink = sink or ConsoleSink()
+
+    # Преобразуем JSON в граф с интернированными вершинами (граф из бинарного файла — как есть)
+    graph = input_str if isinstance(input_str, Graph) else Graph.from_json(input_str)
+    sink.edges(graph)
 
     # Преобразуем список рёбер в матрицу смежности
-    adjacency_matrix = edges_to_adjacency_matrix(edges)
-    print("\nAdjacency Matrix:")
-    for row in adjacency_matrix:
-        print(row)
+    adjacency_matrix = edges_to_adjacency_matrix(graph)
+    sink.adjacency_matrix(adjacency_matrix)
 
     # Преобразуем список рёбер в список смежности
-    adjacency_list = edges_to_adjacency_list(edges)
-    print("\nAdjacency List:")
-    for node in sorted(adjacency_list):
-        print(f"{node}: {adjacency_list[node]}")
-
-    # Строим таблицу с отношениями
-    relationship_table = build_relationship_table(edges)
-    
-    # Выводим таблицу с использованием tabulate
-    headers = ["Node", "r1", "r2", "r3", "r4", "r5"]
-    print("\nRelationship Table:")
-    print(tabulate(relationship_table, headers=headers, tablefmt="grid"))
+    adjacency_list = edges_to_adjacency_list(graph)
+    sink.adjacency_list(adjacency_list)
+
+    # Строим таблицу с отношениями (или берём из кэша по содержимому графа)
+    key = graph_key(graph) if cache is not None else None
+    relationship_table = cached(cache, key, "table", lambda: build_relationship_table(graph))
+    sink.relationship_table(relationship_table)
 
     # Рассчитываем энтропию
-    entropy = calculate_entropy(relationship_table)
-    entropy_headers = ["r1", "r2", "r3", "r4", "r5"]
-    common_entropy = sum(e for e in entropy)
-    print("\nEntropy:", common_entropy )
-    for header, value in zip(entropy_headers, entropy):
-        print(f"{header}: {value:.4f}")
+    entropy = cached(cache, key, "entropy", lambda: calculate_entropy(relationship_table))
+    sink.entropy(entropy)
     return entropy
 
 
+# Энтропия иерархии без вывода; таблица отношений при попадании в кэш не строится
+def hierarchy_entropy(graph, cache=None):
+    if cache is None:
+        return calculate_entropy(build_relationship_table(graph))
+    key = graph_key(graph)
+    return cache.fetch(
+        key, "entropy", lambda: calculate_entropy(cache.fetch(key, "table", lambda: build_relationship_table(graph)))
+    )
+
+# Кэш пакетной оценки: у каждого процесса пула свой LRU, файл SQLite общий
+_batch_cache = None
+
+def _open_batch_cache(path):
+    global _batch_cache
+    _batch_cache = AnalysisCache(path=path) if path else None
+
+# Оценка одной иерархии без вывода: запись с энтропиями r1..r5 и их суммой.
+# input_str — JSON или путь (pathlib.Path) к бинарному графу
+def score_hierarchy(record_id, input_str):
+    try:
+        graph = open_graph(input_str) if isinstance(input_str, os.PathLike) else Graph.from_json(input_str)
+        entropy = hierarchy_entropy(graph, _batch_cache)
+    except ValueError as error:
+        return {"id": record_id, "error": str(error)}
+    # Пустая иерархия даёт пустую таблицу — столбцы r1..r5 всё равно выводятся нулями;
+    # + 0.0 убирает -0.0 из записи
+    values = [value + 0.0 for value in entropy] or [0.0] * 5
+    record = {"id": record_id}
+    record.update(zip(["r1", "r2", "r3", "r4", "r5"], values))
+    record["total"] = sum(values) + 0.0
+    return record
+
+def _score_chunk(chunk):
+    return [score_hierarchy(record_id, input_str) for record_id, input_str in chunk]
+
+# Входные иерархии: *.json и бинарные *.sag из каталога (id — имя файла) или строки
+# NDJSON-файла (id — номер строки). Бинарные графы передаются путём: каждый процесс
+# отображает файл сам, страницы общие
+def iter_hierarchies(path):
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".json"):
+                with open(os.path.join(path, name), encoding="utf-8") as f:
+                    yield os.path.splitext(name)[0], f.read()
+            elif name.endswith(GRAPH_FILE_SUFFIX):
+                yield os.path.splitext(name)[0], pathlib.Path(path, name)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if line.strip():
+                    yield line_number, line
+
+# Пакетная оценка в пуле процессов. Иерархии отправляются пачками по chunk_size,
+# в работе одновременно не больше 2 * workers пачек, записи выдаются в порядке входа
+def score_hierarchies(hierarchies, workers=None, chunk_size=16, cache_path=None):
+    workers = workers or os.cpu_count() or 1
+    hierarchies = iter(hierarchies)
+    chunks = iter(lambda: list(itertools.islice(hierarchies, chunk_size)), [])
+    if workers == 1:
+        _open_batch_cache(cache_path)
+        for chunk in chunks:
+            yield from _score_chunk(chunk)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_open_batch_cache, initargs=(cache_path,)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def batch_main(path, workers=None, chunk_size=16, output=sys.stdout, cache_path=None):
+    with stage("batch") as batch:
+        for record in score_hierarchies(iter_hierarchies(path), workers, chunk_size, cache_path):
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            batch.add(1)
+            if "error" in record:
+                count("batch.errors")
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Структурная энтропия иерархий")
+    parser.add_argument("path", nargs="?", help="каталог с *.json или NDJSON-файл для пакетной оценки")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="число процессов")
+    parser.add_argument("-c", "--chunk-size", type=int, default=16, help="иерархий в одной задаче пула")
+    parser.add_argument("-o", "--output", choices=sorted(SINKS), default="console", help="режим вывода")
+    parser.add_argument("--cache", default=None, metavar="FILE", help="кэш результатов в файле SQLite")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
+    if args.path:
+        batch_main(args.path, args.workers, args.chunk_size, cache_path=args.cache)
+        finish_profiling(args)
+        sys.exit()
+
     input_str = """{
         "1": {
             "2": {
@@ -176,4 +372,5 @@ if __name__ == "__main__":
             }
         }
     }"""
-    main(input_str)
+    main(input_str, make_sink(args.output), AnalysisCache(path=args.cache) if args.cache else None)
+    finish_profiling(args)
@@ -1,5 +1,16 @@
 import math
-from collections import Counter
+import os
+import sys
+from collections import Counter, defaultdict
+
+# Только при запуске файлом (python task4/task.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.lazy import lazy_import
+from common.profiling import count, profiled
+
+np = lazy_import("numpy")
 
 # Энтропия
 def entropy(probabilities):
@@ -11,34 +22,263 @@ def calculate_probabilities(values):
     total = len(values)
     return [count[val] / total for val in count]
 
-def main():
-    # Собираем все возможные комбинации чисел на двух костях
-    rolls = [(i, j) for i in range(1, 7) for j in range(1, 7)]
-    
-    # Событие A - сумма чисел на костях
-    sums = [i + j for i, j in rolls]
-    # Событие B - произведение чисел на костях
-    products = [i * j for i, j in rolls]
-    
-    # Рассчитываем вероятности для суммы и произведения
-    p_sums = calculate_probabilities(sums)
-    p_products = calculate_probabilities(products)
-    
-    # Вычисляем энтропию для событий A и B
-    H_A = entropy(p_sums)
-    H_B = entropy(p_products)
-    
-    # Совместная энтропия H(AB)
-    combined = list(zip(sums, products))  # Преобразуем в список
-    p_AB = calculate_probabilities(combined)
-    H_AB = entropy(p_AB)
-    
-    # Условная энтропия H(B|A)
+# Энтропия по частотам: H = log2(N) - sum(c * log2(c)) / N
+def entropy_from_counts(counts):
+    total = sum(counts)
+    if total == 0:
+        return 0.0
+    return math.log2(total) - sum(c * math.log2(c) for c in counts if c > 0) / total
+
+# Накопитель частот для потоков пар событий (a, b). Обновляется по одному наблюдению
+# или пачкой, энтропии доступны в любой момент, накопители с разных шардов складываются
+class EntropyAccumulator:
+    def __init__(self):
+        self.total = 0
+        self.counts_a = Counter()
+        self.counts_b = Counter()
+        self.counts_ab = Counter()
+
+    def update(self, a, b):
+        self.total += 1
+        self.counts_a[a] += 1
+        self.counts_b[b] += 1
+        self.counts_ab[(a, b)] += 1
+
+    # Пачка наблюдений: частоты пачки считаются через np.unique, а не по одному.
+    # Каждый столбец кодируется отдельно, чтобы ключи пар сохраняли тип значений
+    # своего столбца (общий массив привёл бы 1 и 'x' к строкам)
+    @profiled("entropy_accumulator.update_batch")
+    def update_batch(self, values_a, values_b):
+        values_a = np.asarray(values_a)
+        values_b = np.asarray(values_b)
+        if values_a.shape != values_b.shape:
+            raise ValueError("Длины пачек событий A и B не совпадают")
+
+        columns = []
+        for counts, values in ((self.counts_a, values_a), (self.counts_b, values_b)):
+            unique, codes, frequency = np.unique(values, return_inverse=True, return_counts=True)
+            unique = unique.tolist()
+            counts.update(dict(zip(unique, frequency.tolist())))
+            columns.append((unique, codes.ravel().astype(np.int64)))
+        (unique_a, codes_a), (unique_b, codes_b) = columns
+        pairs, frequency = np.unique(codes_a * len(unique_b) + codes_b, return_counts=True)
+        self.counts_ab.update({
+            (unique_a[pair // len(unique_b)], unique_b[pair % len(unique_b)]): f
+            for pair, f in zip(pairs.tolist(), frequency.tolist())
+        })
+        self.total += len(values_a)
+        count("entropy_accumulator.samples", len(values_a))
+
+    # Слияние накопителей, посчитанных в разных процессах
+    def merge(self, other):
+        self.total += other.total
+        self.counts_a.update(other.counts_a)
+        self.counts_b.update(other.counts_b)
+        self.counts_ab.update(other.counts_ab)
+        return self
+
+    def __iadd__(self, other):
+        return self.merge(other)
+
+    def __add__(self, other):
+        return EntropyAccumulator().merge(self).merge(other)
+
+    # H(AB), H(A), H(B), H(B|A), I(A,B) в том же порядке, что и main
+    def entropies(self):
+        H_A = entropy_from_counts(self.counts_a.values())
+        H_B = entropy_from_counts(self.counts_b.values())
+        H_AB = entropy_from_counts(self.counts_ab.values())
+        H_a_B = H_AB - H_A
+        I_A_B = H_B - H_a_B
+        return [H_AB, H_A, H_B, H_a_B, I_A_B]
+
+# sum(c * log2(c)) по сегментам частот, сегмент s — ключи [offsets[s], offsets[s + 1])
+def _segment_count_log_sums(keys, offsets):
+    if offsets[-1] <= 8 * len(keys):
+        counts = np.bincount(keys, minlength=offsets[-1]).astype(np.float64)
+        terms = counts * np.log2(counts, where=counts > 0, out=np.zeros_like(counts))
+        return np.add.reduceat(terms, offsets[:-1])
+    # Разреженная область ключей: частоты через сортировку
+    unique, counts = np.unique(keys, return_counts=True)
+    segments = np.searchsorted(offsets, unique, side="right") - 1
+    return np.bincount(segments, weights=counts * np.log2(counts), minlength=len(offsets) - 1)
+
+# Попарные энтропии и взаимная информация столбцов таблицы наблюдений
+# (строки — наблюдения, столбцы — категориальные переменные).
+# Возвращает H(Xi), H(Xi,Xj), H(Xj|Xi) и I(Xi,Xj)
+@profiled("pairwise_information")
+def pairwise_information(data):
+    data = np.asarray(data)
+    if data.ndim != 2:
+        raise ValueError("Ожидается двумерный массив: строки — наблюдения, столбцы — переменные")
+    n, m = data.shape
+    count("pairwise_information.samples", n)
+    H_joint = np.zeros((m, m))
+    if n == 0:
+        return np.zeros(m), H_joint, H_joint.copy(), H_joint.copy()
+
+    # Значения каждого столбца кодируются числами 0..k-1
+    codes = np.empty((n, m), dtype=np.int64)
+    cardinality = np.empty(m, dtype=np.int64)
+    for j in range(m):
+        unique, codes[:, j] = np.unique(data[:, j], return_inverse=True)
+        cardinality[j] = len(unique)
+
+    log_n = math.log2(n)
+    for i in range(m):
+        # Все пары (i, j), j >= i, считаются одним bincount: ключ пары смещён
+        # на сумму размеров областей ключей предыдущих пар
+        sizes = cardinality[i] * cardinality[i:]
+        offsets = np.r_[0, np.cumsum(sizes)]
+        keys = offsets[:-1] + codes[:, i, None] * cardinality[i:] + codes[:, i:]
+        H_joint[i, i:] = log_n - _segment_count_log_sums(keys.ravel(), offsets) / n
+        H_joint[i:, i] = H_joint[i, i:]
+
+    # H(Xi, Xi) = H(Xi)
+    H = H_joint.diagonal().copy()
+    H_conditional = H_joint - H[:, None]
+    mutual_information = H[:, None] + H[None, :] - H_joint
+    return H, H_joint, H_conditional, mutual_information
+
+# Энтропия массива вероятностей
+def _entropy_array(probabilities):
+    p = probabilities[probabilities > 0]
+    return float(-(p * np.log2(p)).sum())
+
+# Распределение одной кости с равновероятными гранями 1..faces
+def die_distribution(faces=6):
+    return {face: 1 / faces for face in range(1, faces + 1)}
+
+# Разложение числа на простые множители: {простое: показатель}
+def _factorize(value):
+    factors = {}
+    divisor = 2
+    while divisor * divisor <= value:
+        while value % divisor == 0:
+            factors[divisor] = factors.get(divisor, 0) + 1
+            value //= divisor
+        divisor += 1
+    if value > 1:
+        factors[value] = factors.get(value, 0) + 1
+    return factors
+
+# Кодирование граней одним int64: произведение граней — сумма векторов показателей
+# простых множителей, сумма граней — старшие биты. Тогда совместное распределение
+# (сумма, произведение) — свёртка по сложению ключей. None — если грани не целые
+# положительные или ключ не помещается в 63 бита
+def _pack_faces(dice):
+    faces = {face for die in dice for face in die}
+    if not all(isinstance(face, int) and face > 0 for face in faces):
+        return None
+
+    factors = {face: _factorize(face) for face in faces}
+    shifts = {}
+    bits = 0
+    for prime in sorted({prime for f in factors.values() for prime in f}):
+        bound = sum(max(factors[face].get(prime, 0) for face in die) for die in dice)
+        shifts[prime] = bits
+        bits += bound.bit_length()
+    sum_bits = sum(max(die) for die in dice).bit_length()
+    if bits + sum_bits > 63:
+        return None
+
+    product_keys = {
+        face: sum(exponent << shifts[prime] for prime, exponent in factors[face].items()) for face in faces
+    }
+    return product_keys, bits
+
+# Пар (ключ, грань) в одном блоке свёртки и предел числа различных значений
+# (сумма, произведение): совместный носитель растёт примерно в 2.4 раза на каждую d20
+CONVOLVE_BLOCK_PAIRS = 1 << 22
+DICE_MAX_SUPPORT = 1 << 23
+
+def _check_support(size, max_support):
+    if size > max_support:
+        raise ValueError(
+            f"Совместное распределение содержит больше {max_support} различных значений, "
+            "уменьшите число костей или граней"
+        )
+
+# Свёртка разреженных распределений по сложению ключей: уникальные ключи и их вероятности.
+# Ключи сворачиваются блоками и сливаются с уже накопленным результатом, поэтому
+# временные массивы не больше CONVOLVE_BLOCK_PAIRS элементов плюс размер результата
+def _convolve_keys(keys, probabilities, die_keys, die_probabilities, max_support=DICE_MAX_SUPPORT):
+    rows = max(1, CONVOLVE_BLOCK_PAIRS // len(die_keys))
+    result_keys, result_weights = np.zeros(0, dtype=np.int64), np.zeros(0)
+    for start in range(0, len(keys), rows):
+        block = slice(start, start + rows)
+        combined = np.concatenate([result_keys, (keys[block, None] + die_keys[None, :]).ravel("F")])
+        weights = np.concatenate([result_weights, (probabilities[block, None] * die_probabilities[None, :]).ravel("F")])
+        # Массив состоит из отсортированных отрезков (результат и блок, сдвинутый на каждую
+        # грань), устойчивая сортировка сливает их быстрее, чем np.unique
+        order = np.argsort(combined, kind="stable")
+        combined = combined[order]
+        starts = np.flatnonzero(np.r_[True, combined[1:] != combined[:-1]])
+        result_keys = combined[starts]
+        result_weights = np.add.reduceat(weights[order], starts)
+        _check_support(len(result_keys), max_support)
+    return result_keys, result_weights
+
+# Свёртка словарных распределений для произвольных граней
+def _convolve_dict(distribution, die, operation):
+    result = defaultdict(float)
+    for value, p in distribution.items():
+        for face, q in die.items():
+            result[operation(value, face)] += p * q
+    return result
+
+# Распределения суммы, произведения и пары (сумма, произведение) граней на наборе костей
+def _dice_distributions(dice, max_support=DICE_MAX_SUPPORT):
+    packed = _pack_faces(dice)
+    if packed is None:
+        sums, products, joint = {0: 1.0}, {1: 1.0}, {(0, 1): 1.0}
+        for die in dice:
+            sums = _convolve_dict(sums, die, lambda s, f: s + f)
+            products = _convolve_dict(products, die, lambda p, f: p * f)
+            joint = _convolve_dict(joint, die, lambda sp, f: (sp[0] + f, sp[1] * f))
+            _check_support(len(joint), max_support)
+        return (np.fromiter(d.values(), dtype=np.float64) for d in (sums, products, joint))
+
+    product_keys, product_bits = packed
+    sums = np.ones(1)
+    products = (np.zeros(1, dtype=np.int64), np.ones(1))
+    joint = (np.zeros(1, dtype=np.int64), np.ones(1))
+    for die in dice:
+        faces = list(die)
+        die_probabilities = np.array([die[face] for face in faces], dtype=np.float64)
+
+        # Сумма — обычная свёртка плотных массивов
+        dense = np.zeros(max(faces) + 1)
+        dense[faces] = die_probabilities
+        sums = np.convolve(sums, dense)
+
+        die_products = np.array([product_keys[face] for face in faces], dtype=np.int64)
+        products = _convolve_keys(*products, die_products, die_probabilities, max_support)
+        die_joint = (np.array(faces, dtype=np.int64) << product_bits) + die_products
+        joint = _convolve_keys(*joint, die_joint, die_probabilities, max_support)
+    return sums, products[1], joint[1]
+
+# H(AB), H(A), H(B), H(B|A), I(A,B) для суммы (A) и произведения (B) чисел на костях.
+# dice — список распределений {грань: вероятность}, по одному на кость. Полное
+# пространство исходов не перебирается: стоимость определяется числом различных
+# значений (сумма, произведение), а не faces ** n_dice. Если их больше max_support —
+# ValueError
+@profiled("dice_entropies")
+def dice_entropies_for(dice, max_support=DICE_MAX_SUPPORT):
+    sums, products, joint = _dice_distributions(dice, max_support)
+    H_A = _entropy_array(sums)
+    H_B = _entropy_array(products)
+    H_AB = _entropy_array(joint)
     H_a_B = H_AB - H_A
-    
-    # Информация I(A, B)
     I_A_B = H_B - H_a_B
-    
-    return [round(H_AB, 2), round(H_A, 2), round(H_B, 2), round(H_a_B, 2), round(I_A_B, 2)]
+    return [H_AB, H_A, H_B, H_a_B, I_A_B]
+
+# n_dice одинаковых костей: faces равновероятных граней или распределение distribution
+def dice_entropies(n_dice=2, faces=6, distribution=None):
+    return dice_entropies_for([distribution or die_distribution(faces)] * n_dice)
+
+def main():
+    return [round(value, 2) for value in dice_entropies(2, 6)]
 
-print(main())
+if __name__ == "__main__":
+    print(main())
@@ -1,4 +1,18 @@
+import argparse
+import itertools
 import json
+import os
+import sys
+from bisect import bisect_right
+
+# Только при запуске файлом (python task5/task.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.lazy import lazy_import
+from common.profiling import add_profile_arguments, finish_profiling, profiled, start_profiling
+
+np = lazy_import("numpy")
 
 # Распаковываем элементы ранжировки, чтобы построить правильный порядок
 def flatten_ranking(ranking):
@@ -10,24 +24,192 @@ def flatten_ranking(ranking):
             flat_list.append(item)
     return flat_list
 
+# Ранг каждого объекта с учётом нестрогости: объекты одного кластера получают один ранг
+def ranking_positions(ranking):
+    return {
+        obj: rank
+        for rank, item in enumerate(ranking)
+        for obj in (flatten_ranking(item) if isinstance(item, list) else [item])
+    }
+
+# Объекты, общие для обеих ранжировок, упорядоченные по (ранг в A, ранг в B).
+# В такой последовательности пара противоречива (i строго впереди j в A и строго
+# позади в B) ровно тогда, когда она образует строгую инверсию рангов B
+def _ordered_by_a(ranking_a, ranking_b):
+    positions_a = ranking_positions(ranking_a)
+    positions_b = ranking_positions(ranking_b)
+    common = [obj for obj in positions_a if obj in positions_b]
+    common.sort(key=lambda obj: (positions_a[obj], positions_b[obj]))
+    return common, [positions_b[obj] for obj in common]
+
+# Число строгих инверсий слиянием снизу вверх: на каждом уровне все пары соседних
+# отсортированных отрезков обрабатываются одним searchsorted, O(n log^2 n)
+def _count_strict_inversions(values):
+    runs = np.asarray(values, dtype=np.int64)
+    n = len(runs)
+    if n < 2:
+        return 0
+    span = int(runs.max()) + 1
+    positions = np.arange(n)
+
+    inversions = 0
+    width = 1
+    while width < n:
+        block = positions // (2 * width)
+        is_right = positions % (2 * width) >= width
+        # Смещение на номер блока делает левые отрезки всех блоков одним отсортированным массивом
+        keyed = runs + block * span
+        left = keyed[~is_right]
+        right = keyed[is_right]
+        left_end = np.searchsorted(left, (block[is_right] + 1) * span)
+        inversions += int((left_end - np.searchsorted(left, right, side="right")).sum())
+        runs = np.sort(keyed) - block * span
+        width *= 2
+    return inversions
+
+# Число противоречивых пар без их перечисления
+@profiled("count_contradictions")
+def count_contradictions(ranking_a, ranking_b):
+    _, ranks_b = _ordered_by_a(ranking_a, ranking_b)
+    return _count_strict_inversions(ranks_b)
+
+# Все противоречивые пары [i, j], где i впереди j в A, но позади в B.
+# Слияние отсортированных отрезков: для элемента правого отрезка противоречивы все
+# строго большие элементы левого, то есть его суффикс. O(n log n + число пар)
+@profiled("contradiction_pairs", items=len)
+def contradiction_pairs(ranking_a, ranking_b):
+    common, ranks_b = _ordered_by_a(ranking_a, ranking_b)
+    runs = [[(rank, idx)] for idx, rank in enumerate(ranks_b)]
+
+    pairs = []
+    while len(runs) > 1:
+        merged = []
+        for left, right in zip(runs[::2], runs[1::2]):
+            left_ranks = [rank for rank, _ in left]
+            for rank, idx in right:
+                start = bisect_right(left_ranks, rank)
+                pairs.extend((left_idx, idx) for _, left_idx in left[start:])
+            merged.append(sorted(left + right))
+        if len(runs) % 2:
+            merged.append(runs[-1])
+        runs = merged
+
+    pairs.sort()
+    return [[common[i], common[j]] for i, j in pairs]
+
 # Находим ядро противоречий между двумя ранжировками
+@profiled("contradiction_core")
 def find_contradiction_core(ranking_a, ranking_b):
-    # Преобразуем обе ранжировки в плоские списки
-    flat_a = flatten_ranking(ranking_a)
-    flat_b = flatten_ranking(ranking_b)
-    
-    # Найдем минимальное количество элементов
-    min_length = min(len(flat_a), len(flat_b))
-    
-    contradiction_core = []
-    for i in range(min_length):
-        # Проверяем, находятся ли элементы на разных позициях в каждой ранжировке
-        # Второе условие для того чтобы избежать повторов
-        if (flat_a[i] != flat_b[i]) and not([flat_b[i], flat_a[i]] in contradiction_core):
-            contradiction_core.append([flat_a[i], flat_b[i]])
-
-    return json.dumps(contradiction_core)
+    return json.dumps(contradiction_pairs(ranking_a, ranking_b))
+
+# Матрица отношения ранжировки: Y[i, j] = True, если объект i не хуже объекта j
+def relation_matrix(ranking, objects=None):
+    positions = ranking_positions(ranking)
+    if objects is None:
+        objects = flatten_ranking(ranking)
+    ranks = np.array([positions[obj] for obj in objects])
+    return ranks[:, None] <= ranks[None, :]
+
+# Ранги объектов, общих для всех экспертов: список объектов и массив экспертов x объектов
+def expert_ranks(rankings):
+    positions = [ranking_positions(ranking) for ranking in rankings]
+    objects = [obj for obj in flatten_ranking(rankings[0]) if all(obj in p for p in positions[1:])]
+    ranks = np.array([[p[obj] for obj in objects] for p in positions], dtype=np.int32).reshape(len(rankings), -1)
+    return objects, ranks
+
+_shared_ranks = None
+
+def _share_ranks(ranks):
+    global _shared_ranks
+    _shared_ranks = ranks
+
+# Ядро противоречий экспертов a и b на полосе строк [start, stop). Матрицы отношений
+# строятся плитками tile_size x tile_size, полная матрица n x n не создаётся.
+# Пара (i, j) противоречива, если (Ya & Yb)[i, j] и (Ya.T & Yb.T)[i, j] оба ложны;
+# в ответ попадает ориентация, где i впереди j у эксперта a
+def _core_tile_task(task):
+    a, b, start, stop, tile_size = task
+    ranks_a, ranks_b = _shared_ranks[a], _shared_ranks[b]
+    rows = np.arange(start, stop)
+    found_rows, found_cols = [], []
+    for col_start in range(0, len(ranks_a), tile_size):
+        cols = np.arange(col_start, min(col_start + tile_size, len(ranks_a)))
+        y_a = ranks_a[rows, None] <= ranks_a[None, cols]
+        y_b = ranks_b[rows, None] <= ranks_b[None, cols]
+        y_a_t = ranks_a[rows, None] >= ranks_a[None, cols]
+        y_b_t = ranks_b[rows, None] >= ranks_b[None, cols]
+        core = ~(y_a & y_b) & ~(y_a_t & y_b_t) & ~y_a_t
+        tile_rows, tile_cols = np.nonzero(core)
+        found_rows.append(rows[tile_rows])
+        found_cols.append(cols[tile_cols])
+    return a, b, np.concatenate(found_rows), np.concatenate(found_cols)
+
+# Ядра противоречий всех пар экспертов: {(a, b): [[x, y], ...]}.
+# Полосы строк всех пар обрабатываются в пуле процессов
+@profiled("pairwise_contradiction_cores", items=len)
+def pairwise_contradiction_cores(rankings, workers=None, tile_size=1024):
+    objects, ranks = expert_ranks(rankings)
+    n = len(objects)
+    tasks = [
+        (a, b, start, min(start + tile_size, n), tile_size)
+        for a, b in itertools.combinations(range(len(rankings)), 2)
+        for start in range(0, n, tile_size)
+    ]
+
+    found = {pair: ([], []) for pair in itertools.combinations(range(len(rankings)), 2)}
+    if workers == 1:
+        _share_ranks(ranks)
+        results = map(_core_tile_task, tasks)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_share_ranks, initargs=(ranks,))
+        results = pool.map(_core_tile_task, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1))))
+
+    try:
+        for a, b, rows, cols in results:
+            found[(a, b)][0].append(rows)
+            found[(a, b)][1].append(cols)
+    finally:
+        if workers != 1:
+            pool.shutdown()
+
+    cores = {}
+    for pair, (rows, cols) in found.items():
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+        order = np.lexsort((cols, rows))
+        cores[pair] = [[objects[i], objects[j]] for i, j in zip(rows[order].tolist(), cols[order].tolist())]
+    return cores
+
+# Согласованная ранжировка всех экспертов. Противоречивые пары (и пары, равные у всех
+# экспертов) объединяются в кластеры с замыканием по транзитивности; между разными
+# кластерами все эксперты согласны. Такие кластеры — отрезки последовательности
+# объектов, отсортированной по сумме рангов, поэтому матрица n x n не нужна:
+# граница кластеров проходит там, где каждый объект слева не хуже каждого справа
+# у всех экспертов и соседние векторы рангов различаются
+@profiled("consensus_ranking", items=len)
+def consensus_ranking(rankings):
+    objects, ranks = expert_ranks(rankings)
+    if not objects:
+        return []
+
+    order = np.lexsort((*ranks[::-1], ranks.sum(axis=0)))
+    sorted_ranks = ranks[:, order]
+    prefix_max = np.maximum.accumulate(sorted_ranks, axis=1)
+    suffix_min = np.minimum.accumulate(sorted_ranks[:, ::-1], axis=1)[:, ::-1]
+    boundaries = np.flatnonzero(
+        (prefix_max[:, :-1] <= suffix_min[:, 1:]).all(axis=0)
+        & (sorted_ranks[:, :-1] != sorted_ranks[:, 1:]).any(axis=0)
+    ) + 1
+
+    consensus = []
+    for cluster in np.split(order, boundaries):
+        members = [objects[idx] for idx in sorted(cluster.tolist())]
+        consensus.append(members if len(members) > 1 else members[0])
+    return consensus
 
+@profiled("task5")
 def main(ranking_a, ranking_b):
     # Найдем ядро противоречий
     contradiction_core = find_contradiction_core(ranking_a, ranking_b)
@@ -35,6 +217,11 @@ def main(ranking_a, ranking_b):
     return contradiction_core
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ядро противоречий двух ранжировок")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
     ranking_a = [1, [2, 3], 4, [5, 6, 7], 8, 9, 10]
     ranking_b = [[1, 2], [3, 4, 5], 6, 7, 9, [8, 10]]
-    main(ranking_a, ranking_b)
\ No newline at end of file
+    main(ranking_a, ranking_b)
+    finish_profiling(args)
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+
+# Только при запуске файлом (python task6/server.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.lazy import lazy_import
+from common.profiling import add_profile_arguments, finish_profiling, profiler, start_profiling
+from task6.task import ControlTable, FuzzyController, x1, x2, x3
+
+np = lazy_import("numpy")
+
+
+# Задержки обработки запросов (от чтения строки до готового ответа), мс
+class LatencyStats:
+    def __init__(self, window=100_000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.batches = 0
+        self.batched = 0
+
+    def record(self, latency_ms):
+        self.samples.append(latency_ms)
+        self.count += 1
+
+    def record_batch(self, size):
+        self.batches += 1
+        self.batched += size
+
+    def report(self):
+        report = {
+            "requests": self.count,
+            "batches": self.batches,
+            "mean_batch": self.batched / self.batches if self.batches else 0.0,
+        }
+        if self.samples:
+            samples = np.fromiter(self.samples, dtype=np.float64, count=len(self.samples))
+            p50, p90, p99 = np.percentile(samples, [50, 90, 99])
+            report.update(
+                latency_mean_ms=float(samples.mean()),
+                latency_p50_ms=float(p50),
+                latency_p90_ms=float(p90),
+                latency_p99_ms=float(p99),
+                latency_max_ms=float(samples.max()),
+            )
+        return report
+
+
+# Сервис вывода по строкам json: запрос {"id": ..., "temperature": t},
+# ответ {"id": ..., "control": u, "latency_ms": ...}; {"stats": true} — сводка задержек.
+# Запросы всех соединений собираются в микропакеты (не больше max_batch или
+# max_delay секунд ожидания) и считаются одним вызовом evaluate_batch.
+# Противодавление: очередь ограничена max_pending, а соединение держит не больше
+# max_in_flight неотвеченных запросов — пока они не обработаны, строки не читаются
+class BatchingServer:
+    def __init__(self, evaluate_batch, max_batch=256, max_delay=0.002, max_pending=4096, max_in_flight=128):
+        self.evaluate_batch = evaluate_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.max_in_flight = max_in_flight
+        self.stats = LatencyStats()
+        self._queue = None
+        self._batcher = None
+        self._handlers = set()
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        self._queue = asyncio.Queue(self.max_pending)
+        self._batcher = asyncio.create_task(self._run_batches())
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self._handle, path=unix_path)
+        return await asyncio.start_server(self._handle, host, port)
+
+    # Обработчики соединений останавливаются раньше цикла событий: иначе их отменяет
+    # asyncio.run, и отмена попадает в журнал как необработанная ошибка обработчика
+    async def stop(self):
+        handlers = list(self._handlers)
+        for handler in handlers:
+            handler.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+
+    async def _run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            temperatures = np.array([temperature for temperature, _ in batch], dtype=np.float64)
+            try:
+                # numpy отпускает GIL, поэтому пакет считается вне цикла событий
+                control = await loop.run_in_executor(None, self.evaluate_batch, temperatures)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                continue
+            self.stats.record_batch(len(batch))
+            for (_, future), value in zip(batch, control.tolist()):
+                if not future.done():
+                    future.set_result(value)
+
+    async def _respond(self, request, started):
+        if request.get("stats"):
+            if profiler.enabled:
+                return {"stats": self.stats.report(), "profile": profiler.report()}
+            return {"stats": self.stats.report()}
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((float(request["temperature"]), future))
+        response = {"id": request.get("id"), "control": await future}
+        latency = (time.perf_counter() - started) * 1000
+        self.stats.record(latency)
+        response["latency_ms"] = latency
+        return response
+
+    async def _handle(self, reader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        # Ответы пишутся в порядке запросов соединения
+        pending = asyncio.Queue(self.max_in_flight)
+
+        async def read_requests():
+            while line := await reader.readline():
+                started = time.perf_counter()
+                try:
+                    request = json.loads(line)
+                    if not request.get("stats"):
+                        float(request["temperature"])
+                except (ValueError, KeyError, TypeError, AttributeError) as error:
+                    failed = asyncio.get_running_loop().create_future()
+                    failed.set_result({"error": f"некорректный запрос: {error!r}"})
+                    await pending.put(failed)
+                    continue
+                await pending.put(asyncio.create_task(self._respond(request, started)))
+            await pending.put(None)
+
+        async def write_responses():
+            while True:
+                task = await pending.get()
+                if task is None:
+                    break
+                try:
+                    response = await task
+                except Exception as error:
+                    response = {"error": str(error)}
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+
+        # Чтение и запись идут параллельно; если одна сторона падает (клиент сбросил
+        # соединение), другая останавливается, а неотвеченные запросы отменяются —
+        # иначе чтение навсегда заснуло бы на заполненной очереди pending.
+        # Отмена обработчика (stop) завершает соединение так же и не выходит наружу
+        tasks = [asyncio.create_task(read_requests()), asyncio.create_task(write_responses())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        except asyncio.CancelledError:
+            pass
+        for task in tasks:
+            task.cancel()
+        while not pending.empty():
+            task = pending.get_nowait()
+            if task is not None:
+                task.cancel()
+                tasks.append(task)
+        results = []
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            writer.close()
+            self._handlers.discard(handler)
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, ConnectionError):
+                print(f"ошибка соединения: {result!r}", file=sys.stderr)
+
+
+# Нагрузочный клиент: clients соединений по requests запросов, все запросы
+# соединения отправляются сразу (конвейером)
+async def load_test(host="127.0.0.1", port=8765, unix_path=None, clients=32, requests=1000, seed=0):
+    rng = np.random.default_rng(seed)
+
+    async def client(index):
+        if unix_path is not None:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        temperatures = rng.uniform(-10, 50, requests)
+        lines = (json.dumps({"id": f"{index}-{i}", "temperature": t}) for i, t in enumerate(temperatures.tolist()))
+
+        # запись отдельной задачей: сервер читает не дальше max_in_flight запросов
+        async def send():
+            writer.write(("\n".join(lines) + "\n").encode())
+            await writer.drain()
+
+        sending = asyncio.create_task(send())
+        latencies = []
+        for _ in range(requests):
+            latencies.append(json.loads(await reader.readline())["latency_ms"])
+        await sending
+        writer.close()
+        await writer.wait_closed()
+        return latencies
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies = np.concatenate([np.asarray(latency) for latency in results])
+    p50, p99 = np.percentile(latencies, [50, 99])
+    return {
+        "requests": len(latencies),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "latency_p50_ms": float(p50),
+        "latency_p99_ms": float(p99),
+    }
+
+
+def build_evaluator(exact=False, table=None):
+    if table is not None:
+        return ControlTable.load(table).lookup_batch
+    controller = FuzzyController(x1, x2, x3, defuzzification="exact" if exact else "sampled")
+    return controller.evaluate_batch
+
+
+async def serve(args):
+    server = BatchingServer(
+        build_evaluator(args.exact, args.table),
+        max_batch=args.max_batch,
+        max_delay=args.max_delay_ms / 1000,
+        max_pending=args.max_pending,
+        max_in_flight=args.max_in_flight,
+    )
+    listener = await server.start(args.host, args.port, args.unix)
+    try:
+        async with listener:
+            try:
+                if args.load_test:
+                    print(json.dumps(await load_test(args.host, args.port, args.unix, args.clients, args.load_test)))
+                else:
+                    await listener.serve_forever()
+            finally:
+                # Новые соединения больше не принимаются, открытые закрываются до выхода
+                # из async with (в Python 3.12+ он ждёт закрытия всех соединений)
+                listener.close()
+                await server.stop()
+    finally:
+        print(json.dumps(server.stats.report(), ensure_ascii=False), file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервис нечёткого регулятора (строки json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="путь Unix-сокета вместо TCP")
+    parser.add_argument("--max-batch", type=int, default=256, help="наибольший размер микропакета")
+    parser.add_argument("--max-delay-ms", type=float, default=2.0, help="окно сбора микропакета, мс")
+    parser.add_argument("--max-pending", type=int, default=4096, help="длина очереди запросов")
+    parser.add_argument("--max-in-flight", type=int, default=128, help="неотвеченных запросов на соединение")
+    parser.add_argument("--exact", action="store_true", help="точный центроид вместо сетки")
+    parser.add_argument("--table", default=None, help="таблица ControlTable (.npz) вместо регулятора")
+    parser.add_argument("--load-test", type=int, default=0, metavar="N", help="запустить нагрузку: N запросов на клиента")
+    parser.add_argument("--clients", type=int, default=32, help="число клиентов нагрузки")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+    start_profiling(args)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    finish_profiling(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,21 @@
-import numpy as np
+import argparse
 import json
+import os
+import sys
+from bisect import bisect_right
 
-# данные из json содержащего термы температуры
-temp = ["холодно", "комфортно", "жарко"]
-# a, b, c, d - набор вершин трапеции
-# у нас будет три набора
-a, b, c, d = [0, 18, 24], [0, 22, 26], [18, 24, 50], [22, 26, 50]
+# Только при запуске файлом (python task6/task.py): корень репозитория в пути импорта
+if not __package__:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# данные из json содержащего термы нагревания
-heat = ["слабый", "умеренный", "интенсивный"]
-# e, f, g, h - набор вершин трапеции
-# у нас будет три набора
-e, f, g, h = [0, 3, 6], [0, 4, 7], [3, 6, 10], [4, 7, 10]
+from common.lazy import lazy_import
+from common.profiling import add_profile_arguments, count, finish_profiling, profiled, start_profiling
 
+np = lazy_import("numpy")
+
+# Число значений в результате пакетного вычисления (для профилировщика)
+def _size(values):
+    return np.size(values)
 
 # Функция принадлежности трапециевидной формы
 def trapezoidal_membership(x, a, b, c, d):
@@ -55,79 +58,458 @@ def defuzzify(aggregated_function, s_range):
     return numerator / denominator if denominator != 0 else 0
 
 
-def main(temperature_func, heat_level_func, management_system, temperature):
-    s_range=np.linspace(0, 14, 100)
-    # преобразуем json строки в удобный для чтения формат
-    temperature_func_json = json.loads(temperature_func)
-    heat_level_func_json = json.loads(heat_level_func)
-    management_system_json = json.loads(management_system)
-
-    # парсинг термов "температура"
-    # сложные условия при парсинге сделаны для того чтобы вычислить правильные вершины трапеций
-    for i, temp_data in enumerate(temperature_func_json["температура"]):
-        temp[i] = temp_data["id"]
-        if temp_data["points"][0][1] == 1 and temp_data["points"][1][1] == 1:
-            a[i] = temp_data["points"][0][0]
-            b[i] = temp_data["points"][0][0]
-            c[i] = temp_data["points"][1][0]
-            d[i] = temp_data["points"][2][0]
-        elif temp_data["points"][0][1] == 0 and temp_data["points"][1][1] == 0:
-            a[i] = temp_data["points"][1][0]
-            b[i] = temp_data["points"][2][0]
-            c[i] = temp_data["points"][3][0]
-            d[i] = temp_data["points"][3][0]
-        else:
-            a[i] = temp_data["points"][0][0]
-            b[i] = temp_data["points"][1][0]
-            c[i] = temp_data["points"][2][0]
-            d[i] = temp_data["points"][3][0]
-
-    # парсинг термов "уровень нагрева"
-    for i, heat_data in enumerate(heat_level_func_json["температура"]):
-        heat[i] = heat_data["id"]
-        if heat_data["points"][0][1] == 1 and heat_data["points"][1][1] == 1:
-            e[i] = heat_data["points"][0][0]
-            f[i] = heat_data["points"][0][0]
-            g[i] = heat_data["points"][1][0]
-            h[i] = heat_data["points"][2][0]
-        elif heat_data["points"][0][1] == 0 and heat_data["points"][1][1] == 0:
-            e[i] = heat_data["points"][1][0]
-            f[i] = heat_data["points"][2][0]
-            g[i] = heat_data["points"][3][0]
-            h[i] = heat_data["points"][3][0]
+# Вершины трапеции a, b, c, d по точкам терма из json.
+# Сложные условия нужны для того, чтобы вычислить правильные вершины трапеций у "плеч"
+def trapezoid_vertices(points):
+    if points[0][1] == 1 and points[1][1] == 1:
+        return points[0][0], points[0][0], points[1][0], points[2][0]
+    if points[0][1] == 0 and points[1][1] == 0:
+        return points[1][0], points[2][0], points[3][0], points[3][0]
+    return points[0][0], points[1][0], points[2][0], points[3][0]
+
+# Список термов из json: кортеж имён и массив вершин трапеций (число термов x 4)
+def parse_terms(terms):
+    names = tuple(term["id"] for term in terms)
+    vertices = np.array([trapezoid_vertices(term["points"]) for term in terms], dtype=np.float64).reshape(-1, 4)
+    vertices.flags.writeable = False
+    return names, vertices
+
+# Функция принадлежности трапециевидной формы для массивов: x и вершины транслируются
+# по правилам numpy, ветви те же, что в trapezoidal_membership
+def trapezoidal_membership_array(x, a, b, c, d):
+    x = np.asarray(x, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.select(
+            [(x < a) | (x > d), x < b, x <= c, x <= d],
+            [0.0, (x - a) / (b - a), 1.0, (d - x) / (d - c)],
+            0.0,
+        )
+
+# Точный центроид функции max_k(activation_k * T_k(s)) для трапеций T_k с вершинами vertices.
+# Функция кусочно-линейная: изломы — вершины трапеций и точки пересечения пар
+# линейных кусков внутри промежутков между вершинами. Между изломами интегралы
+# площади и момента берутся по формуле трапеций точно. activation — (выборка x термы)
+def exact_centroid(activation, vertices):
+    activation = np.atleast_2d(np.asarray(activation, dtype=np.float64))
+    knots = np.unique(vertices)
+    left, right = knots[:-1], knots[1:]
+
+    # На каждом промежутке между вершинами терм k линеен: T_k(s) = slope * s + intercept
+    lo = left + (right - left) / 3
+    hi = left + 2 * (right - left) / 3
+    at_lo = trapezoidal_membership_array(lo[:, None], *vertices.T)
+    at_hi = trapezoidal_membership_array(hi[:, None], *vertices.T)
+    slope = (at_hi - at_lo) / (hi - lo)[:, None]
+    intercept = at_lo - slope * lo[:, None]
+
+    # Пересечения пар термов k < l с учётом активаций, прижатые к своему промежутку
+    k, l = np.triu_indices(vertices.shape[0], 1)
+    a_k, a_l = activation[:, None, k], activation[:, None, l]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = (a_l * intercept[:, l] - a_k * intercept[:, k]) / (a_k * slope[:, k] - a_l * slope[:, l])
+    crossing = np.where(np.isfinite(crossing), crossing, left[:, None])
+    crossing = np.clip(crossing, left[:, None], right[:, None]).reshape(len(activation), -1)
+
+    breaks = np.sort(np.concatenate([np.broadcast_to(knots, (len(activation), len(knots))), crossing], axis=1), axis=1)
+    x0, x1 = breaks[:, :-1], breaks[:, 1:]
+    width = x1 - x0
+
+    # Между изломами функция линейна: значения на концах (односторонние пределы)
+    # восстанавливаются по двум внутренним точкам
+    def aggregated(points):
+        membership = trapezoidal_membership_array(points[..., None], *vertices.T)
+        return (activation[:, None, :] * membership).max(axis=2)
+
+    p = x0 + width / 3
+    q = x0 + 2 * width / 3
+    y_p, y_q = aggregated(p), aggregated(q)
+    y0 = 2 * y_p - y_q
+    y1 = 2 * y_q - y_p
+
+    area = (width * (y0 + y1) / 2).sum(axis=1)
+    moment = (width / 6 * (x0 * (2 * y0 + y1) + x1 * (y0 + 2 * y1))).sum(axis=1)
+    return np.divide(moment, area, out=np.zeros_like(area), where=area > 0)
+
+# Объединение нечетких выводов и дефаззификация для активаций выходных термов
+# (выборка x термы): по сетке s_range или точным центроидом
+def defuzzify_activation(activation, heat_vertices, heat_membership, s_range, method):
+    if method == "exact":
+        return exact_centroid(activation, heat_vertices)
+    aggregated = (activation[:, :, None] * heat_membership[None, :, :]).max(axis=1, initial=0.0)
+    numerator = aggregated @ s_range
+    denominator = aggregated.sum(axis=1)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+# Нечёткий регулятор, собранный один раз из json термов и правил.
+# Все данные — неизменяемые массивы numpy, поэтому evaluate можно вызывать
+# одновременно из нескольких потоков. defuzzification="sampled" — центроид по сетке
+# s_range, как в исходной реализации; "exact" — точный центроид (exact_centroid)
+class FuzzyController:
+    def __init__(self, temperature_func, heat_level_func, management_system, s_range=None, defuzzification="sampled"):
+        if defuzzification not in ("sampled", "exact"):
+            raise ValueError(f"Неизвестный способ дефаззификации: {defuzzification}")
+        self.defuzzification = defuzzification
+
+        # преобразуем json строки в удобный для чтения формат
+        self.temperature_terms, self.temperature_vertices = parse_terms(json.loads(temperature_func)["температура"])
+        self.heat_terms, self.heat_vertices = parse_terms(json.loads(heat_level_func)["температура"])
+
+        # парсинг правил логики управления: номер входного терма -> номер выходного терма
+        rules = json.loads(management_system)
+        temperature_index = {term: i for i, term in enumerate(self.temperature_terms)}
+        heat_index = {term: i for i, term in enumerate(self.heat_terms)}
+        known_rules = [(temp_term, heat_term) for temp_term, heat_term in rules.items() if temp_term in temperature_index]
+        self.rule_inputs = np.array([temperature_index[t] for t, _ in known_rules], dtype=np.int64)
+        self.rule_outputs = np.array([heat_index[h] for _, h in known_rules], dtype=np.int64)
+
+        # Функции принадлежности выходных термов на сетке s_range считаются один раз
+        self.s_range = np.linspace(0, 14, 100) if s_range is None else np.asarray(s_range, dtype=np.float64)
+        self.heat_membership = trapezoidal_membership_array(self.s_range[None, :], *self.heat_vertices.T[:, :, None])
+
+        for array in (self.rule_inputs, self.rule_outputs, self.s_range, self.heat_membership):
+            array.flags.writeable = False
+
+    # фаззификация: степени принадлежности температур всем входным термам, форма (..., термы)
+    def fuzzify(self, temperatures):
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        return trapezoidal_membership_array(temperatures[..., None], *self.temperature_vertices.T)
+
+    # нечеткий вывод: активация выходного терма — максимум по сработавшим правилам
+    def apply_rules(self, membership):
+        membership = np.asarray(membership).reshape(-1, len(self.temperature_terms))
+        activation = np.zeros((len(membership), len(self.heat_terms)))
+        np.maximum.at(activation.T, self.rule_outputs, membership[:, self.rule_inputs].T)
+        return activation
+
+    # Управление для массива температур. Выборка обрабатывается пачками по chunk_size,
+    # чтобы промежуточный массив (пачка x термы x сетка) оставался ограниченным
+    @profiled("fuzzy_controller.evaluate_batch", items=_size)
+    def evaluate_batch(self, temperatures, chunk_size=4096):
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        flat = temperatures.ravel()
+        control = np.empty(len(flat))
+        for start in range(0, len(flat), chunk_size):
+            activation = self.apply_rules(self.fuzzify(flat[start:start + chunk_size]))
+            control[start:start + chunk_size] = defuzzify_activation(
+                activation, self.heat_vertices, self.heat_membership, self.s_range, self.defuzzification
+            )
+        return control.reshape(temperatures.shape)
+
+    def evaluate(self, temperature):
+        return float(self.evaluate_batch(temperature))
+
+    # Входной универсум: вне [min a, max d] все степени принадлежности равны нулю
+    def universe(self):
+        return float(self.temperature_vertices[:, 0].min()), float(self.temperature_vertices[:, 3].max())
+
+    # Точки универсума, между которыми кривая управления не меняет аналитического вида:
+    # вершины входных трапеций, пересечения принадлежностей правил с общим выходным
+    # термом (смена максимума в активации) и температуры, при которых в одной из точек
+    # дефаззификации меняется терм с наибольшим activation_k * T_k(s). Точки — узлы
+    # сетки s_range или, для "exact", вершины выходных трапеций. Между соседними
+    # точками при дефаззификации по сетке числитель и знаменатель центроида линейны
+    # по температуре, и кривая дробно-линейна
+    def breakpoints(self):
+        lo, hi = self.universe()
+        knots = np.unique(self.temperature_vertices.clip(lo, hi))
+        rule_k, rule_l = np.nonzero(np.triu(self.rule_outputs[:, None] == self.rule_outputs[None, :], 1))
+        knots = _crossings(knots, lambda t: self.fuzzify(t)[:, self.rule_inputs], rule_k, rule_l)
+
+        if self.defuzzification == "exact":
+            points = np.unique(self.heat_vertices)
+            membership = trapezoidal_membership_array(points[None, :], *self.heat_vertices.T[:, :, None])
         else:
-            e[i] = heat_data["points"][0][0]
-            f[i] = heat_data["points"][1][0]
-            g[i] = heat_data["points"][2][0]
-            h[i] = heat_data["points"][3][0]
-
-    # парсинг правил логики управления
-    rules = {}
-    for key, value in management_system_json.items():
-        rules[key]=value
-
-    temperature_sets = {
-        temp[0]: lambda x: trapezoidal_membership(x, a[0], b[0], c[0], d[0]),
-        temp[1]: lambda x: trapezoidal_membership(x, a[1], b[1], c[1], d[1]),
-        temp[2]: lambda x: trapezoidal_membership(x, a[2], b[2], c[2], d[2]),
-    }
-
-    heater_power_sets = {
-        heat[0]: lambda x: trapezoidal_membership(x, e[0], f[0], g[0], h[0]),
-        heat[1]: lambda x: trapezoidal_membership(x, e[1], f[1], g[1], h[1]),
-        heat[2]: lambda x: trapezoidal_membership(x, e[2], f[2], g[2], h[2]),
-    }
-
-    # фаззификация
-    fuzzy_temp = fuzzify_temperature(temperature_sets, temperature)
-    # нечеткий вывод
-    activated_rules = apply_rules(rules, fuzzy_temp)
-    # объединение нечетких выводов
-    aggregated_func = aggregate_outputs(heater_power_sets, activated_rules)
-    # дефаззификация
-    optimal_control = defuzzify(aggregated_func, s_range)
-
-    return optimal_control
+            membership = self.heat_membership
+        term_k, term_l = np.triu_indices(len(self.heat_terms), 1)
+        return _crossings(knots, lambda t: self.apply_rules(self.fuzzify(t)), term_k, term_l, membership)
+
+
+# Добавляет к узлам knots точки пересечения функций values(t) -> (t x m), линейных
+# на каждом отрезке между узлами: для пар столбцов (k, l) решается
+# weights[k] * value_k(t) = weights[l] * value_l(t), weights — (m x точки), по умолчанию 1
+def _crossings(knots, values, k, l, weights=None):
+    left, right = knots[:-1], knots[1:]
+    t1, t2 = left + (right - left) / 3, left + 2 * (right - left) / 3
+    v1, v2 = values(t1), values(t2)
+    slope = (v2 - v1) / (t2 - t1)[:, None]
+    intercept = v1 - slope * t1[:, None]
+    if weights is None:
+        weights = np.ones((v1.shape[1], 1))
+    slope_k, slope_l = slope[:, k, None] * weights[k], slope[:, l, None] * weights[l]
+    intercept_k, intercept_l = intercept[:, k, None] * weights[k], intercept[:, l, None] * weights[l]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = (intercept_l - intercept_k) / (slope_k - slope_l)
+    inside = np.isfinite(crossing) & (crossing > left[:, None, None]) & (crossing < right[:, None, None])
+    return np.unique(np.concatenate([knots, crossing[inside]]))
+
+# Наибольшее отклонение линейной интерполяции от дробно-линейной функции на ячейке
+# по её значениям на левом конце, в середине и на правом конце. Для g(u) = (A + Bu) / (1 + Cu)
+# отклонение равно C * (g(1) - g(0)) * u(1 - u) / (1 + Cu), максимум по u даёт
+# |sqrt|x| - sqrt|y|| * (|x| + |y|) / (sqrt|x| + sqrt|y|), где x = g(0) - g(1/2), y = g(1/2) - g(1).
+# Немонотонные тройки такой функцией быть не могут — для них берётся |x| + |y|
+def _interpolation_error(left, middle, right):
+    x, y = left - middle, middle - right
+    root_x, root_y = np.sqrt(np.abs(x)), np.sqrt(np.abs(y))
+    total = np.abs(x) + np.abs(y)
+    error = np.divide(np.abs(root_x - root_y) * total, root_x + root_y, out=np.zeros_like(total), where=total > 0)
+    return np.where(x * y >= 0, error, total)
+
+
+# Таблица значений регулятора для быстрого поиска. Узлы controller.breakpoints() делят
+# универсум на отрезки, внутри которых кривая управления гладкая (при дефаззификации
+# по сетке — дробно-линейная); каждый отрезок покрыт своей равномерной сеткой.
+# Поиск — выбор отрезка бинарным поиском по узлам, номер ячейки и линейная интерполяция.
+# error_bound — оценка сверху отклонения от регулятора: для каждой ячейки берётся
+# большее из точного отклонения дробно-линейной функции по трём значениям и отклонения,
+# измеренного в check_factor - 1 внутренних точках, с запасом ERROR_MARGIN. Для
+# дефаззификации по сетке первая величина точна с точностью до округления, запас
+# покрывает округление и "exact", где кривая между узлами лишь близка к дробно-линейной
+class ControlTable:
+    ERROR_MARGIN = 1.25
+
+    def __init__(self, starts, steps, cells, values, outside=(0.0, 0.0), error_bound=None):
+        self.starts = np.array(starts, dtype=np.float64)
+        self.steps = np.array(steps, dtype=np.float64)
+        self.cells = np.array(cells, dtype=np.int64)
+        self.offsets = np.r_[0, np.cumsum(self.cells + 1)[:-1]].astype(np.int64)
+        self.values = np.array(values, dtype=np.float64)
+        for array in (self.starts, self.steps, self.cells, self.offsets, self.values):
+            array.flags.writeable = False
+        self.lo = float(self.starts[0])
+        self.hi = float(self.starts[-1] + self.steps[-1] * self.cells[-1])
+        self.outside = tuple(float(value) for value in outside)
+        self.error_bound = error_bound
+        self._segments = list(zip(self.steps.tolist(), self.cells.tolist(), self.offsets.tolist()))
+        self._starts = self.starts.tolist()
+        self._values = self.values.tolist()
+
+    # Таблица не меньше чем на resolution ячеек, распределённых по длине отрезков.
+    # Пока оценка погрешности больше max_error, ячейки удваиваются в тех отрезках,
+    # где она превышена (всего не больше max_resolution ячеек)
+    @classmethod
+    @profiled("control_table.build")
+    def from_controller(cls, controller, resolution=1024, max_error=1e-3, check_factor=8, max_resolution=1 << 20):
+        if check_factor < 2 or check_factor % 2:
+            raise ValueError("check_factor должен быть чётным и не меньше 2")
+        lo, hi = controller.universe()
+        span = hi - lo
+        outside = (controller.evaluate(lo - max(span, 1.0)), controller.evaluate(hi + max(span, 1.0)))
+        breakpoints = controller.breakpoints()
+        lengths = np.diff(breakpoints)
+        cells = np.maximum(1, np.ceil(resolution * lengths / span)).astype(np.int64)
+        offsets = np.arange(1, check_factor) / check_factor
+
+        while True:
+            steps = lengths / cells
+            grids = [start + step * np.arange(n + 1) for start, step, n in zip(breakpoints, steps, cells)]
+            values = [controller.evaluate_batch(grid) for grid in grids]
+            errors = []
+            for grid, step, segment_values in zip(grids, steps, values):
+                # Последний узел отрезка — предел слева, чтобы скачки на вершинах не размывались
+                segment_values[-1] = controller.evaluate(np.nextafter(grid[-1], -np.inf))
+                left, right = segment_values[:-1, None], segment_values[1:, None]
+                check = controller.evaluate_batch(grid[:-1, None] + offsets[None, :] * step)
+                measured = np.abs(check - (left + offsets[None, :] * (right - left))).max(axis=1)
+                exact = _interpolation_error(left[:, 0], check[:, check_factor // 2 - 1], right[:, 0])
+                errors.append(cls.ERROR_MARGIN * np.maximum(measured, exact).max(initial=0.0))
+            errors = np.array(errors)
+
+            exceeded = errors > max_error if max_error is not None else np.zeros(len(cells), dtype=bool)
+            if not exceeded.any() or cells.sum() + cells[exceeded].sum() > max_resolution:
+                return cls(breakpoints[:-1], steps, cells, np.concatenate(values), outside, float(errors.max(initial=0.0)))
+            cells = np.where(exceeded, cells * 2, cells)
+
+    def lookup(self, temperature):
+        if temperature < self.lo:
+            return self.outside[0]
+        if temperature > self.hi:
+            return self.outside[1]
+        segment = max(bisect_right(self._starts, temperature) - 1, 0)
+        step, cells, offset = self._segments[segment]
+        position = (temperature - self._starts[segment]) / step
+        idx = min(int(position), cells - 1)
+        left = self._values[offset + idx]
+        return left + (position - idx) * (self._values[offset + idx + 1] - left)
+
+    @profiled("control_table.lookup_batch", items=_size)
+    def lookup_batch(self, temperatures):
+        temperatures = np.asarray(temperatures, dtype=np.float64)
+        segment = np.clip(np.searchsorted(self.starts, temperatures, side="right") - 1, 0, len(self.starts) - 1)
+        position = (temperatures - self.starts[segment]) / self.steps[segment]
+        idx = np.clip(position.astype(np.int64), 0, self.cells[segment] - 1)
+        left = self.values[self.offsets[segment] + idx]
+        control = left + (position - idx) * (self.values[self.offsets[segment] + idx + 1] - left)
+        control = np.where(temperatures < self.lo, self.outside[0], control)
+        return np.where(temperatures > self.hi, self.outside[1], control)
+
+    def save(self, path):
+        np.savez(
+            path,
+            starts=self.starts,
+            steps=self.steps,
+            cells=self.cells,
+            values=self.values,
+            outside=np.array(self.outside),
+            error_bound=np.array(np.nan if self.error_bound is None else self.error_bound),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            error_bound = float(data["error_bound"])
+            return cls(
+                data["starts"],
+                data["steps"],
+                data["cells"],
+                data["values"],
+                data["outside"],
+                None if np.isnan(error_bound) else error_bound,
+            )
+
+# Объединение отрезков [starts[i], starts[i] + counts[i]) в один массив индексов
+def _concat_ranges(starts, counts):
+    total = int(counts.sum())
+    shift = np.repeat(starts - np.r_[0, np.cumsum(counts)[:-1]], counts)
+    return shift + np.arange(total)
+
+def _load_json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+# Правила из json. Формат задачи {"терм": "выходной терм"} относится к первой входной
+# переменной, в которой есть такой терм. Общий формат — список правил
+# {"if": {"переменная": "терм", ...}, "then": "выходной терм", "operator": "and" | "or"}
+def parse_rules(rules_json, variables):
+    if isinstance(rules_json, dict):
+        rules = []
+        for term, output in rules_json.items():
+            variable = next((name for name, (terms, _) in variables.items() if term in terms), None)
+            if variable is not None:
+                rules.append({"if": {variable: term}, "then": output})
+        return rules
+    return list(rules_json)
+
+# Движок нечёткого вывода с несколькими входами, произвольным числом термов и
+# правилами AND (минимум) / OR (максимум). Правила проиндексированы по входным
+# термам: для каждого наблюдения вычисляются только правила, в которых есть терм
+# с ненулевой принадлежностью, поэтому стоимость зависит от числа сработавших правил
+class RuleEngine:
+    def __init__(self, input_terms, output_terms, rules, s_range=None, defuzzification="sampled"):
+        if defuzzification not in ("sampled", "exact"):
+            raise ValueError(f"Неизвестный способ дефаззификации: {defuzzification}")
+        self.defuzzification = defuzzification
+
+        # Входные переменные: все термы получают сквозные номера
+        input_terms = _load_json(input_terms)
+        variables = {name: parse_terms(terms) for name, terms in input_terms.items()}
+        self.variables = tuple(variables)
+        term_index = {}
+        term_variable = []
+        term_vertices = []
+        for v, (name, (terms, vertices)) in enumerate(variables.items()):
+            for term, vertex in zip(terms, vertices):
+                term_index[(name, term)] = len(term_variable)
+                term_variable.append(v)
+                term_vertices.append(vertex)
+        self.term_variable = np.array(term_variable, dtype=np.int64)
+        self.term_vertices = np.array(term_vertices, dtype=np.float64).reshape(-1, 4)
+
+        # Выходная переменная одна
+        output_terms = _load_json(output_terms)
+        (output_name, output_list), = output_terms.items()
+        self.output_terms, self.output_vertices = parse_terms(output_list)
+        output_index = {term: i for i, term in enumerate(self.output_terms)}
+
+        # Правила в CSR: термы правила, оператор, выходной терм
+        rule_terms, rule_indptr, rule_is_and, rule_output = [], [0], [], []
+        for rule in parse_rules(_load_json(rules), variables):
+            condition = rule["if"]
+            if not condition:
+                raise ValueError("У правила нет условий")
+            operator = rule.get("operator", "and").lower()
+            if operator not in ("and", "or"):
+                raise ValueError(f"Неизвестный оператор правила: {operator}")
+            rule_terms.extend(term_index[(variable, term)] for variable, term in condition.items())
+            rule_indptr.append(len(rule_terms))
+            rule_is_and.append(operator == "and")
+            rule_output.append(output_index[rule["then"]])
+        self.rule_terms = np.array(rule_terms, dtype=np.int64)
+        self.rule_indptr = np.array(rule_indptr, dtype=np.int64)
+        self.rule_is_and = np.array(rule_is_and, dtype=bool)
+        self.rule_output = np.array(rule_output, dtype=np.int64)
+
+        # Индекс: входной терм -> правила, в которых он встречается
+        rule_of_term = np.repeat(np.arange(len(rule_output)), np.diff(self.rule_indptr))
+        order = np.argsort(self.rule_terms, kind="stable")
+        self.term_rules = rule_of_term[order]
+        self.term_rules_indptr = np.r_[0, np.cumsum(np.bincount(self.rule_terms, minlength=len(term_variable)))]
+
+        self.s_range = np.linspace(0, 14, 100) if s_range is None else np.asarray(s_range, dtype=np.float64)
+        self.output_membership = trapezoidal_membership_array(self.s_range[None, :], *self.output_vertices.T[:, :, None])
+
+        for array in (
+            self.term_variable, self.term_vertices, self.output_vertices, self.rule_terms, self.rule_indptr,
+            self.rule_is_and, self.rule_output, self.term_rules, self.term_rules_indptr, self.s_range,
+            self.output_membership,
+        ):
+            array.flags.writeable = False
+
+    # Входы: словарь {переменная: массив значений} или массив (наблюдения x переменные)
+    def _inputs(self, inputs):
+        if isinstance(inputs, dict):
+            return np.column_stack([np.asarray(inputs[name], dtype=np.float64).ravel() for name in self.variables])
+        return np.asarray(inputs, dtype=np.float64).reshape(-1, len(self.variables))
+
+    # Активации выходных термов (наблюдения x выходные термы) и число сработавших правил
+    def activations(self, inputs):
+        inputs = self._inputs(inputs)
+        n = len(inputs)
+        membership = trapezoidal_membership_array(inputs[:, self.term_variable], *self.term_vertices.T)
+        activation = np.zeros((n, len(self.output_terms)))
+
+        # Пары (наблюдение, правило) только для термов с ненулевой принадлежностью
+        samples, terms = np.nonzero(membership)
+        counts = self.term_rules_indptr[terms + 1] - self.term_rules_indptr[terms]
+        pair_samples = np.repeat(samples, counts)
+        pair_rules = self.term_rules[_concat_ranges(self.term_rules_indptr[terms], counts)]
+        keys = np.sort(pair_samples * len(self.rule_output) + pair_rules)
+        if len(keys) == 0:
+            return activation, 0
+        keys = keys[np.r_[True, keys[1:] != keys[:-1]]]
+        pair_samples, pair_rules = np.divmod(keys, len(self.rule_output))
+
+        # Сила правила — минимум (AND) или максимум (OR) по его термам
+        lengths = self.rule_indptr[pair_rules + 1] - self.rule_indptr[pair_rules]
+        values = membership[
+            np.repeat(pair_samples, lengths), self.rule_terms[_concat_ranges(self.rule_indptr[pair_rules], lengths)]
+        ]
+        starts = np.r_[0, np.cumsum(lengths)[:-1]]
+        strength = np.where(
+            self.rule_is_and[pair_rules], np.minimum.reduceat(values, starts), np.maximum.reduceat(values, starts)
+        )
+        np.maximum.at(activation, (pair_samples, self.rule_output[pair_rules]), strength)
+        fired = int(np.count_nonzero(strength))
+        count("rule_engine.rules_fired", fired)
+        return activation, fired
+
+    @profiled("rule_engine.evaluate_batch", items=_size)
+    def evaluate_batch(self, inputs, chunk_size=4096):
+        inputs = self._inputs(inputs)
+        control = np.empty(len(inputs))
+        for start in range(0, len(inputs), chunk_size):
+            activation, _ = self.activations(inputs[start:start + chunk_size])
+            control[start:start + chunk_size] = defuzzify_activation(
+                activation, self.output_vertices, self.output_membership, self.s_range, self.defuzzification
+            )
+        return control
+
+    # Одно наблюдение: значения входов по именам переменных
+    def evaluate(self, **inputs):
+        return float(self.evaluate_batch({name: [value] for name, value in inputs.items()})[0])
+
+
+@profiled("task6")
+def main(temperature_func, heat_level_func, management_system, temperature):
+    return FuzzyController(temperature_func, heat_level_func, management_system).evaluate(temperature)
 
 
 x1 = """{
@@ -198,6 +580,12 @@ x3= """{
     "жарко":"слабый"
 }"""
 
-current_temperature = 19  # Текущая температура
-optimal_heating = main(x1, x2, x3, current_temperature)
-print(f"Оптимальное управление: {optimal_heating}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нечёткий регулятор отопления")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    start_profiling(args)
+    current_temperature = 19  # Текущая температура
+    optimal_heating = main(x1, x2, x3, current_temperature)
+    print(f"Оптимальное управление: {optimal_heating}")
+    finish_profiling(args)